@@ -1,8 +1,11 @@
 import ast
 import enum
+import functools
 import io
 import json
+import multiprocessing
 import os
+import time
 
 from assessment.code_scanner.utils import log
 
@@ -11,7 +14,8 @@ try:
 except ImportError:
     import re
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, asdict, fields, MISSING
 from pathlib import Path
 from typing import Iterator, TextIO, List, Dict, Optional, Tuple, Union, Callable
 
@@ -30,16 +34,17 @@ class SourceType(enum.Enum):
     # an alert
 
 
-def enum_to_string_factory(data):
-    def convert_value(obj):
-        # If a single field is too long, truncate it
-        if isinstance(obj, str):
-            if len(obj) > 10000:
-                return f"{obj[:10000]}..."
-        if isinstance(obj, enum.Enum):
-            return obj.value
-        return obj
+def convert_value(obj):
+    # If a single field is too long, truncate it
+    if isinstance(obj, str):
+        if len(obj) > 10000:
+            return f"{obj[:10000]}..."
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    return obj
+
 
+def enum_to_string_factory(data):
     return dict((k, convert_value(v)) for k, v in data)
 
 
@@ -62,10 +67,19 @@ class Issue:
 
     @staticmethod
     def issues_to_df(issues: Union[Iterator['Issue'], List['Issue']]) -> pd.DataFrame:
-        issues = [asdict(issue, dict_factory=enum_to_string_factory) for issue in issues]
-
-        if len(issues) > 0:
-            return pd.DataFrame(issues)
+        # build the frame column by column as the issues stream in rather than from a list of row dicts,
+        # only the nested issue source needs the recursive asdict
+        columns = {f.name: [] for f in fields(Issue)}
+        # (field name, column list) pairs resolved once instead of looked up per issue
+        field_columns = [(k, col) for k, col in columns.items() if k != "issue_source"]
+        issue_source_column = columns["issue_source"]
+        for issue in issues:
+            for k, col in field_columns:
+                col.append(convert_value(getattr(issue, k)))
+            issue_source_column.append(asdict(issue.issue_source, dict_factory=enum_to_string_factory))
+
+        if len(columns["issue_type"]) > 0:
+            return pd.DataFrame(columns)
         return pd.DataFrame(columns=["issue_type", "issue_detail", "issue_source", "line_number", "matched_regex", ])
 
     @staticmethod
@@ -95,6 +109,24 @@ class Issue:
         pdf = pd.read_csv(io.BytesIO(csv_bytes))
         return Issue.from_df(pdf)
 
+    @staticmethod
+    def dataframe_from_csv_bytes(csv_bytes: bytes) -> pd.DataFrame:
+        # parse for display without building an Issue per row, issue_source stays the csv string which
+        # from_df turns back into an IssueSource when the issues are actually resolved
+        try:
+            pdf = pd.read_csv(io.BytesIO(csv_bytes), engine="pyarrow")
+            field_names = [f.name for f in fields(Issue)]
+            # reject the same files Issue(**row) would
+            missing = [f.name for f in fields(Issue) if f.name not in pdf.columns and f.default is MISSING]
+            unknown = [c for c in pdf.columns if c not in field_names]
+            if len(missing) > 0 or len(unknown) > 0:
+                raise ValueError(f"missing columns: {missing} unknown columns: {unknown}")
+            # the type and detail only take a handful of values, as categories they are compared on small int codes
+            return pdf.reindex(columns=field_names).astype({"issue_type": "category", "issue_detail": "category"})
+        except Exception as e:
+            log.error("Error parsing issues csv: %s", e)
+        return pd.DataFrame()
+
 @dataclass
 class IssueInfo:
     issue_type: str
@@ -130,6 +162,11 @@ issue_cfg: Dict[str, IssueInfo] = {
 }
 
 
+@functools.lru_cache(maxsize=None)
+def any_issue_regex(issue_regexprs: Tuple[str, ...]):
+    return re.compile("|".join(f"(?:{r})" for r in issue_regexprs))
+
+
 def generate_file_name_issue(issue_source: IssueSource, file_name: str) -> Optional[Issue]:
     if file_name.endswith(".scala"):
         return Issue(line_number=None, matched_regex=None, matched_value=None,
@@ -245,8 +282,17 @@ def generate_issues(content: TextIO, issue_regexprs: Dict[str, IssueInfo],
                                                              issue_source.source_metadata.get("file_path"))
         if potential_file_name_issue is not None:
             yield potential_file_name_issue
-    lines = content.read().splitlines()
+    # one search with the combined pattern, compiled once per process, rules out lines without any issue before
+    # trying every regex one by one, none of the issue regexes can match across a line break so a file without a hit
+    # for the combined pattern has no issue lines at all and is not split into lines
+    any_issue_re = any_issue_regex(tuple(issue_regexprs))
+    data = content.read()
+    if any_issue_re.search(data) is None:
+        return
+    lines = data.splitlines()
     for idx, line in enumerate(lines):
+        if any_issue_re.search(line) is None:
+            continue
         # first go through actual mounts in workspace
         # then scan the regexprs which are all flags or indicators but are not actually able to be replaced
         # identify if exact / simple match was found, if so break
@@ -308,18 +354,39 @@ class CodeStrategy(ABC):
         return Issue.issues_to_df(self.iter_issues())
 
 
+def scan_file(issue_source: IssueSource,
+              discovered_mounts: Optional[List[Mount]] = None) -> Tuple[IssueSource, List[Issue]]:
+    # module level so it can be pickled to the scan worker processes
+    try:
+        with Path(issue_source.source_metadata.get("file_path")).open("r", encoding="utf-8") as fp:
+            return issue_source, list(generate_issues(fp, issue_cfg, issue_source=issue_source, file_name=None,
+                                                      discovered_mounts=discovered_mounts))
+    except (OSError, UnicodeDecodeError):
+        log.error(f"Unable to open file {issue_source.source_metadata.get('relative_file_path')}")
+        return issue_source, []
+
+
 class LocalFSCodeStrategy(CodeStrategy):
 
     def __init__(self, directories: List[Path],
                  set_max_prog: Callable[[int], None] = None,
                  set_curr_prog: Callable[[int], None] = None,
                  set_curr_file: Callable[[str], None] = None,
-                 discovered_mounts: Optional[List[Mount]] = None):
+                 discovered_mounts: Optional[List[Mount]] = None,
+                 progress_interval_s: float = 0.1,
+                 max_workers: Optional[int] = None,
+                 min_files_for_workers: int = 1000):
         super().__init__(discovered_mounts=discovered_mounts)
         self.set_curr_file = set_curr_file
         self.set_curr_prog = set_curr_prog
+        # every progress callback re-renders the ui so they are rate limited rather than called per file
+        self.progress_interval_s = progress_interval_s
         self.set_max_prog = set_max_prog
         self.directories = directories
+        # scanning is cpu bound on the regexes so large repos are scanned in worker processes, small ones are not
+        # worth the few seconds it takes to spawn them
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.min_files_for_workers = min_files_for_workers
 
     @staticmethod
     def get_path(src: IssueSource) -> str:
@@ -340,10 +407,7 @@ class LocalFSCodeStrategy(CodeStrategy):
                 file_count += len(files)
         return file_count
 
-    def iter_content(self):
-        if self.set_max_prog is not None:
-            self.set_max_prog(self.file_count(self.directories))
-        curr_prog = 0
+    def iter_file_sources(self) -> Iterator[IssueSource]:
         for code_dir in self.directories:
             code_dir_with_suffix = str(code_dir).rstrip("/") + "/"
             for root, dirs, files in os.walk(str(code_dir)):
@@ -352,20 +416,30 @@ class LocalFSCodeStrategy(CodeStrategy):
                     dirs.remove('.git')
                 for file in files:
                     file_path = os.path.join(root, file)
-                    try:
-                        if self.set_curr_file is not None:
-                            self.set_curr_file(file_path.replace(code_dir_with_suffix, ""))
-                        fp = Path(file_path).open("r", encoding="utf-8")
-                        yield IssueSource(SourceType.FILE, source_metadata={
-                            "file_path": file_path,
-                            "relative_file_path": file_path.replace(code_dir_with_suffix, "")
-                        }), fp
-                    except (OSError, UnicodeDecodeError):
-                        log.error(f"Unable to open file {file_path}")
-                    finally:
-                        if self.set_curr_prog is not None:
-                            curr_prog += 1
-                            self.set_curr_prog(curr_prog)
+                    yield IssueSource(SourceType.FILE, source_metadata={
+                        "file_path": file_path,
+                        "relative_file_path": file_path.replace(code_dir_with_suffix, "")
+                    })
+
+    def track_progress(self, items: Iterator, source_of: Callable[..., IssueSource] = lambda item: item,
+                       file_count: Optional[int] = None) -> Iterator:
+        if self.set_max_prog is not None:
+            self.set_max_prog(file_count if file_count is not None else self.file_count(self.directories))
+        curr_prog = 0
+        last_progress_update = 0.0
+        for item in items:
+            now = time.monotonic()
+            update_progress = now - last_progress_update >= self.progress_interval_s
+            if update_progress is True:
+                last_progress_update = now
+            try:
+                if self.set_curr_file is not None and update_progress is True:
+                    self.set_curr_file(self.get_relative_path(source_of(item)))
+                yield item
+            finally:
+                curr_prog += 1
+                if self.set_curr_prog is not None and update_progress is True:
+                    self.set_curr_prog(curr_prog)
 
         # end
         if self.set_curr_file is not None:
@@ -375,6 +449,30 @@ class LocalFSCodeStrategy(CodeStrategy):
         if self.set_curr_prog is not None:
             self.set_curr_prog(0)
 
+    def iter_content(self):
+        for issue_source in self.track_progress(self.iter_file_sources()):
+            try:
+                fp = Path(self.get_path(issue_source)).open("r", encoding="utf-8")
+                yield issue_source, fp
+            except (OSError, UnicodeDecodeError):
+                log.error(f"Unable to open file {self.get_path(issue_source)}")
+
+    def iter_issues(self) -> Iterator[Issue]:
+        # without explicit mounts the workers would have to look them up through dbutils which they do not have
+        file_count = None
+        if self.max_workers > 1 and self._discovered_mounts is not None:
+            file_count = self.file_count(self.directories)
+        if file_count is None or file_count < self.min_files_for_workers:
+            yield from super().iter_issues()
+            return
+        # spawn rather than fork, the ui server is multi threaded
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")) as ex:
+            results = ex.map(functools.partial(scan_file, discovered_mounts=self._discovered_mounts),
+                             self.iter_file_sources(), chunksize=32)
+            for issue_source, file_issues in self.track_progress(results, source_of=lambda r: r[0],
+                                                                 file_count=file_count):
+                yield from file_issues
+
 
 class TestingCodeStrategyClusters(CodeStrategy):
 
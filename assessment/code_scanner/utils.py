@@ -3,11 +3,13 @@ import io
 import json
 import logging
 import os
+import shutil
+import tempfile
 import time
 import zipfile
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Union
+from typing import IO, List, Optional, Union
 
 from databricks.sdk import WorkspaceClient
 
@@ -239,16 +241,29 @@ def change_log_filename(logger, new_log_file):
     logger.addHandler(file_handler)
 
 
-def zip_bytes(input_bytes, file_name):
+def zip_bytes(input_bytes, file_name, compresslevel=None):
     output_buffer = io.BytesIO()
 
-    with zipfile.ZipFile(output_buffer, 'w', zipfile.ZIP_DEFLATED) as zipf:
+    with zipfile.ZipFile(output_buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as zipf:
         zipf.writestr(file_name, input_bytes)
 
     compressed_bytes = output_buffer.getvalue()
     return compressed_bytes
 
 
+def zip_file(file_path, file_name) -> IO[bytes]:
+    # copy the file into the archive in chunks instead of reading it fully into memory first, the archive itself
+    # spills to disk once large and is handed back as a file so it is not copied into a bytes object either
+    output_buffer = tempfile.SpooledTemporaryFile(max_size=64 << 20)
+
+    with zipfile.ZipFile(output_buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zipf:
+        with open(file_path, "rb") as src, zipf.open(file_name, "w", force_zip64=True) as dst:
+            shutil.copyfileobj(src, dst, length=1 << 20)
+
+    output_buffer.seek(0)
+    return output_buffer
+
+
 log = setup_logger("default_logs.txt")
 
 stdout_handler = logging.StreamHandler()
@@ -81,28 +81,43 @@ class BaseJobsResultsManager(abc.ABC):
         pass
 
     def create_runs(self, list_of_workspace_urls: List[Tuple[str, str]], alias_mapping: Dict[str, str]) -> None:
-        for client in self._ws_clients:
-            if client.config.host in list_of_workspace_urls:
-                cluster_id = self._workspace_url_cluster_id_mapping[client.config.host]
-                log.info(f"Creating run in workspace: %s on cluster: %s", client.config.host, cluster_id)
-                run_id = self._create_run(client, cluster_id)
-                run_url = client.jobs.get_run(run_id=run_id).run_page_url
-                log.info(f"Created run in workspace: {client.config.host} with run_id: {run_id} and run_url: {run_url}")
-                self._repository.create_job_run(
-                    JobRun(
-                        workspace_url=client.config.host,
-                        run_id=run_id,
-                        run_url=run_url,
-                        workspace_alias=alias_mapping[client.config.host],
-                        job_name=self.job_name()
+        job_runs = []
+        try:
+            for client in self._ws_clients:
+                if client.config.host in list_of_workspace_urls:
+                    cluster_id = self._workspace_url_cluster_id_mapping[client.config.host]
+                    log.info(f"Creating run in workspace: %s on cluster: %s", client.config.host, cluster_id)
+                    run_id = self._create_run(client, cluster_id)
+                    run_url = client.jobs.get_run(run_id=run_id).run_page_url
+                    log.info(f"Created run in workspace: {client.config.host} with run_id: {run_id} "
+                             f"and run_url: {run_url}")
+                    job_runs.append(
+                        JobRun(
+                            workspace_url=client.config.host,
+                            run_id=run_id,
+                            run_url=run_url,
+                            workspace_alias=alias_mapping[client.config.host],
+                            job_name=self.job_name()
+                        )
                     )
-                )
-
-    def update_run_status(self):
+        except BaseException:
+            # record every run that was submitted even if a later workspace failed, without letting a storage error
+            # replace the submit error that is raised
+            try:
+                self._repository.create_job_runs(job_runs)
+            except Exception:
+                log.exception("Unable to record %s submitted runs", len(job_runs))
+            raise
+        self._repository.create_job_runs(job_runs)
+
+    def update_run_status(self) -> int:
+        # returns how many incomplete runs were checked so callers can poll less often when there are none
+        checked = 0
         for client in self._ws_clients:
             runs: List[str] = self._repository.get_incomplete_run_ids(
                 workspace_urls=[client.config.host],
             )
+            checked += len(runs)
             state_updates = []
             for run_id in runs:
                 run_status = client.jobs.get_run(run_id=run_id).state
@@ -111,6 +126,7 @@ class BaseJobsResultsManager(abc.ABC):
                                       run_status.result_state))
 
             self._repository.update_job_run_state(state_updates)
+        return checked
 
 
 # class FakeJob(BaseJobsResultsManager):
@@ -4,12 +4,13 @@ from typing import List, Optional
 
 import pandas as pd
 from databricks.sdk.service.jobs import RunResultState, RunLifeCycleState
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Enum, UniqueConstraint, func, desc
+from sqlalchemy import create_engine, String, DateTime, Enum, UniqueConstraint, func, desc, select, tuple_
 from sqlalchemy.exc import IntegrityError
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, DeclarativeBase, Mapped, mapped_column
 
-Base = declarative_base()
+
+class Base(DeclarativeBase):
+    pass
 
 
 # class JobRunState(PyEnum):
@@ -23,49 +24,55 @@ Base = declarative_base()
 class JobRun(Base):
     __tablename__ = "job_runs"
 
-    id = Column(Integer, primary_key=True, index=True)
-    run_id = Column(String, index=True)
-    job_name = Column(String)
-    run_url = Column(String, nullable=True)
-    workspace_alias = Column(String, nullable=True)
-    workspace_url = Column(String, index=True)
-    lifecycle_state = Column(Enum(RunLifeCycleState), default=RunLifeCycleState.PENDING)
-    result_state = Column(Enum(RunResultState), nullable=True)
-    state_updated_time = Column(DateTime, default=datetime.utcnow)  # New field
-    start_time = Column(DateTime, default=datetime.utcnow)
-    end_time = Column(DateTime, nullable=True)
+    id: Mapped[int] = mapped_column(primary_key=True, index=True)
+    run_id: Mapped[Optional[str]] = mapped_column(String, index=True)
+    job_name: Mapped[Optional[str]] = mapped_column(String)
+    run_url: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    workspace_alias: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    workspace_url: Mapped[Optional[str]] = mapped_column(String, index=True)
+    lifecycle_state: Mapped[Optional[RunLifeCycleState]] = mapped_column(Enum(RunLifeCycleState),
+                                                                         default=RunLifeCycleState.PENDING)
+    result_state: Mapped[Optional[RunResultState]] = mapped_column(Enum(RunResultState), nullable=True)
+    state_updated_time: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.utcnow)  # New field
+    start_time: Mapped[Optional[datetime]] = mapped_column(DateTime, default=datetime.utcnow)
+    end_time: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
 
     __table_args__ = (UniqueConstraint('workspace_url', 'run_id', name='_workspace_run_uc'),)
 
+    _dataframe_columns = ['id', 'workspace_alias', 'run_id', 'lifecycle_state', 'result_state', 'start_time',
+                          'end_time', 'run_url', 'state_updated_time', 'workspace_url']
+    _display_dataframe_columns = ['id', 'alias', 'run_url', 'workspace_url', 'lifecycle', 'result', 'last_updated',
+                                  'start', 'end']
+
     @staticmethod
     def to_dataframe(runs: List['JobRun'], json_friendly=False, no_millis=False) -> pd.DataFrame:
 
         def remove_millis(dt):
             return str(dt).split(".")[0]
 
-        data = []
-
-        for job_run in runs:
-            data.append({
-                'id': job_run.id,
-                'workspace_alias': job_run.workspace_alias,
-                'run_id': job_run.run_id,
-                'lifecycle_state': job_run.lifecycle_state if json_friendly is False else job_run.lifecycle_state.value,
-                'result_state': job_run.result_state if json_friendly is False else job_run.result_state and job_run.result_state.value,
-                'start_time': job_run.start_time if no_millis is False else remove_millis(job_run.start_time),
-                'end_time': job_run.end_time if no_millis is False else remove_millis(job_run.end_time),
-                'run_url': job_run.run_url,
-                'state_updated_time': job_run.state_updated_time if no_millis is False else remove_millis(
-                    job_run.state_updated_time),
-                'workspace_url': job_run.workspace_url,
-            })
-
-        df = pd.DataFrame(data)
-        return df
+        records = [(
+            job_run.id,
+            job_run.workspace_alias,
+            job_run.run_id,
+            job_run.lifecycle_state if json_friendly is False else job_run.lifecycle_state.value,
+            job_run.result_state if json_friendly is False else job_run.result_state and job_run.result_state.value,
+            # start time stays a datetime either way so it is parsed once here instead of by every consumer
+            job_run.start_time if no_millis is False else job_run.start_time.replace(microsecond=0),
+            job_run.end_time if no_millis is False else remove_millis(job_run.end_time),
+            job_run.run_url,
+            job_run.state_updated_time if no_millis is False else remove_millis(job_run.state_updated_time),
+            job_run.workspace_url,
+        ) for job_run in runs]
+
+        df = pd.DataFrame.from_records(records, columns=JobRun._dataframe_columns, nrows=len(records))
+        dtypes = {'id': 'int64', 'start_time': 'datetime64[ns]'}
+        if no_millis is False:
+            dtypes.update({'end_time': 'datetime64[ns]', 'state_updated_time': 'datetime64[ns]'})
+        return df.astype(dtypes, copy=False)
 
     @staticmethod
     def to_display_dataframe(runs: List['JobRun']) -> pd.DataFrame:
-        data = []
+        records = []
 
         def remove_millis(dt):
             return str(dt).split(".")[0]
@@ -78,21 +85,20 @@ class JobRun(Base):
             else:
                 result_state = f"{job_run.result_state.value}"
             life_cycle_state = (job_run.lifecycle_state and job_run.lifecycle_state.value) or "PENDING"
-            data.append({
-                'id': job_run.id,
-                'alias': job_run.workspace_alias,
-                # 'run_id': job_run.run_id,
-                'run_url': job_run.run_url,
-                'workspace_url': job_run.workspace_url,
-                'lifecycle': life_cycle_state,
-                'result': result_state,
-                'last_updated': remove_millis(job_run.state_updated_time),
-                'start': remove_millis(job_run.start_time),
-                'end': remove_millis(job_run.end_time)
-            })
-
-        df = pd.DataFrame(data)
-        return df
+            records.append((
+                job_run.id,
+                job_run.workspace_alias,
+                job_run.run_url,
+                job_run.workspace_url,
+                life_cycle_state,
+                result_state,
+                remove_millis(job_run.state_updated_time),
+                remove_millis(job_run.start_time),
+                remove_millis(job_run.end_time)
+            ))
+
+        df = pd.DataFrame.from_records(records, columns=JobRun._display_dataframe_columns, nrows=len(records))
+        return df.astype({'id': 'int64'}, copy=False)
 
 
 # Repository Abstraction
@@ -100,13 +106,16 @@ class JobRunRepository:
     def __init__(self,
                  db_path: Path,
                  create_if_not_exists=True,
-                 logging_enabled=False, ):
+                 logging_enabled=False,
+                 maintenance_every_n_updates: int = 1000):
         db_path.parent.mkdir(parents=True, exist_ok=True)  # Ensure the parent directory exists
         self.create_if_not_exists = create_if_not_exists
         self.logging_enabled = logging_enabled
         self.db_path = db_path
         self.engine = None
         self.SessionLocal = None
+        self.maintenance_every_n_updates = maintenance_every_n_updates
+        self._updates_since_maintenance = 0
         # self.engine = create_engine(f"sqlite:///{db_path}",  # f"?check_same_thread=False"
         #                             echo=logging_enabled)
         # if create_if_not_exists is True:
@@ -114,80 +123,123 @@ class JobRunRepository:
         # self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
 
     def make_session(self):
+        # compiled statements are cached per engine so keep the cache big enough for every query shape
         self.engine = create_engine(f"sqlite:///{self.db_path}",  # f"?check_same_thread=False"
-                                    echo=self.logging_enabled)
+                                    echo=self.logging_enabled,
+                                    query_cache_size=1200)
         if self.create_if_not_exists is True:
             JobRun.metadata.create_all(self.engine)
-        self.SessionLocal = sessionmaker(bind=self.engine)
+        # objects handed back stay readable after their session is closed
+        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False)
 
     def create_job_run(self, job_run: JobRun) -> JobRun:
+        return self.create_job_runs([job_run])[0]
+
+    def create_job_runs(self, job_runs: List[JobRun]) -> List[JobRun]:
         if self.engine is None or self.SessionLocal is None:
             self.make_session()
-        db = self.SessionLocal()
-        try:
-            db.add(job_run)
-            db.commit()
-            db.refresh(job_run)
-        except IntegrityError as e:
-            db.rollback()
-            existing_job_run = (
-                db.query(JobRun)
-                .filter(JobRun.workspace_url == job_run.workspace_url, JobRun.run_id == job_run.run_id)
-                .first()
-            )
-            return existing_job_run
-        return job_run
+        keys = [(job_run.workspace_url, job_run.run_id) for job_run in job_runs]
+        if len(keys) == 0:
+            return []
+        with self.SessionLocal() as db:
+            def find_existing():
+                # single (workspace_url, run_id) IN lookup which is served by the unique index
+                return {(existing.workspace_url, existing.run_id): existing for existing in db.execute(
+                    select(JobRun).where(tuple_(JobRun.workspace_url, JobRun.run_id).in_(keys))
+                ).scalars()}
+
+            # check for existing runs up front so conflicts never hit the rollback path
+            existing_job_runs = find_existing()
+            while True:
+                new_job_runs = {}
+                for key, job_run in zip(keys, job_runs):
+                    if key not in existing_job_runs and key not in new_job_runs:
+                        new_job_runs[key] = job_run
+                if len(new_job_runs) == 0:
+                    break
+                try:
+                    db.add_all(new_job_runs.values())
+                    db.commit()
+                    for job_run in new_job_runs.values():
+                        db.refresh(job_run)
+                    existing_job_runs.update(new_job_runs)
+                    break
+                except IntegrityError:
+                    # someone else inserted some of the same runs in the mean time, keep theirs and insert the rest
+                    db.rollback()
+                    found_job_runs = find_existing()
+                    if len(found_job_runs) == len(existing_job_runs):
+                        # the conflict was not another writer's run so retrying would fail the same way
+                        raise
+                    existing_job_runs = found_job_runs
+            return [existing_job_runs[key] for key in keys]
 
     def update_job_run_state(self, run_state_updates: list):
         if self.engine is None or self.SessionLocal is None:
             self.make_session()
-        db = self.SessionLocal()
-        updated_job_runs = []
-
-        for run_id, lifecycle_state, result_state in run_state_updates:
-            job_run = db.query(JobRun).filter(JobRun.run_id == run_id).first()
-            if job_run:
-                job_run.lifecycle_state = lifecycle_state
-                if result_state:
-                    job_run.result_state = result_state
-                job_run.state_updated_time = datetime.utcnow()
-                if lifecycle_state in [RunLifeCycleState.TERMINATED, RunLifeCycleState.SKIPPED]:
-                    job_run.end_time = datetime.utcnow()
-                updated_job_runs.append(job_run)
-
-        db.commit()
+        with self.SessionLocal() as db:
+            updated_job_runs = []
+
+            for run_id, lifecycle_state, result_state in run_state_updates:
+                job_run = db.execute(select(JobRun).where(JobRun.run_id == run_id)).scalars().first()
+                if job_run:
+                    job_run.lifecycle_state = lifecycle_state
+                    if result_state:
+                        job_run.result_state = result_state
+                    job_run.state_updated_time = datetime.utcnow()
+                    if lifecycle_state in [RunLifeCycleState.TERMINATED, RunLifeCycleState.SKIPPED]:
+                        job_run.end_time = datetime.utcnow()
+                    updated_job_runs.append(job_run)
+
+            db.commit()
+
+        # state updates churn the table so refresh the planner statistics every n updates
+        self._updates_since_maintenance += len(updated_job_runs)
+        if self._updates_since_maintenance >= self.maintenance_every_n_updates:
+            self.maintenance()
         return updated_job_runs
 
+    def maintenance(self, vacuum=False):
+        if self.engine is None or self.SessionLocal is None:
+            self.make_session()
+        with self.engine.begin() as conn:
+            conn.exec_driver_sql("ANALYZE")
+            conn.exec_driver_sql("PRAGMA optimize")
+        if vacuum is True:
+            # VACUUM cannot run inside a transaction
+            with self.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                conn.exec_driver_sql("VACUUM")
+        self._updates_since_maintenance = 0
+
     def get_latest_run_results(self, workspace_urls: Optional[List[str]] = None,
                                job_names: Optional[List[str]] = None,
                                num_runs: int = 5
                                ) -> List[JobRun]:
         if self.engine is None or self.SessionLocal is None:
             self.make_session()
-        db = self.SessionLocal()
-
-        subquery = (
-            db.query(
+        with self.SessionLocal() as db:
+            ranked = select(
                 JobRun,
                 func.row_number().over(
                     partition_by=(JobRun.workspace_url, JobRun.job_name),
                     order_by=desc(JobRun.start_time)
                 ).label("row_num")
             )
-            .filter(JobRun.workspace_url.in_(workspace_urls) if workspace_urls else True)
-            .filter(JobRun.job_name.in_(job_names) if job_names else True)
-            .subquery()
-        )
-
-        query = (
-            db.query(subquery)
-            .filter(subquery.c.row_num <= num_runs)
-            .order_by(subquery.c.workspace_url, subquery.c.job_name, subquery.c.start_time.desc())
-        )
-
-        latest_runs = query.all()
+            # only add predicates that are actually set so we don't emit a "WHERE 1 = 1" tautology
+            if workspace_urls:
+                ranked = ranked.where(JobRun.workspace_url.in_(workspace_urls))
+            if job_names:
+                ranked = ranked.where(JobRun.job_name.in_(job_names))
+            subquery = ranked.subquery()
+
+            query = (
+                select(subquery)
+                .where(subquery.c.row_num <= num_runs)
+                .order_by(subquery.c.workspace_url, subquery.c.job_name, subquery.c.start_time.desc())
+            )
 
-        return latest_runs
+            latest_runs = db.execute(query).all()
+            return latest_runs
 
     #
     # def get_latest_run_results(self, workspace_urls: Optional[List[str]] = None,
@@ -211,37 +263,35 @@ class JobRunRepository:
     def get_incomplete_run_ids(self, workspace_urls: list) -> List[str]:
         if self.engine is None or self.SessionLocal is None:
             self.make_session()
-        db = self.SessionLocal()
-        incomplete_run_ids = (
-            db.query(JobRun.run_id)
-            .filter(
-                JobRun.workspace_url.in_(workspace_urls),
-                JobRun.lifecycle_state.notin_([RunLifeCycleState.TERMINATED,
-                                               RunLifeCycleState.INTERNAL_ERROR,
-                                               RunLifeCycleState.SKIPPED]),
-            )
-            .all()
-        )
-        return [run_id for (run_id,) in incomplete_run_ids]
+        with self.SessionLocal() as db:
+            incomplete_run_ids = db.execute(
+                select(JobRun.run_id)
+                .where(
+                    JobRun.workspace_url.in_(workspace_urls),
+                    JobRun.lifecycle_state.notin_([RunLifeCycleState.TERMINATED,
+                                                   RunLifeCycleState.INTERNAL_ERROR,
+                                                   RunLifeCycleState.SKIPPED]),
+                )
+            ).scalars().all()
+            return list(incomplete_run_ids)
 
     def get_latest_successful_run(self, workspace_url: str, job_name: str) -> Optional[JobRun]:
         if self.engine is None or self.SessionLocal is None:
             self.make_session()
-        db = self.SessionLocal()
-        latest_successful_run = (
-            db.query(JobRun)
-            .filter(
-                JobRun.workspace_url == workspace_url,
-                JobRun.job_name == job_name,
-                JobRun.result_state == RunResultState.SUCCESS
-            )
-            .order_by(JobRun.start_time.desc())
-            .first()
-        )
-        return latest_successful_run
+        with self.SessionLocal() as db:
+            latest_successful_run = db.execute(
+                select(JobRun)
+                .where(
+                    JobRun.workspace_url == workspace_url,
+                    JobRun.job_name == job_name,
+                    JobRun.result_state == RunResultState.SUCCESS
+                )
+                .order_by(JobRun.start_time.desc())
+            ).scalars().first()
+            return latest_successful_run
 
     def list(self):
         if self.engine is None or self.SessionLocal is None:
             self.make_session()
-        db = self.SessionLocal()
-        return db.query(JobRun).all()
+        with self.SessionLocal() as db:
+            return list(db.execute(select(JobRun)).scalars().all())
@@ -35,12 +35,27 @@ dbfs_folder_path, debug_mode, workspace_name, workspace_url
 
 # COMMAND ----------
 
+# DBTITLE 1,Spark Configurations
+# ship python <-> jvm data as arrow record batches instead of pickled rows (createDataFrame and toPandas)
+spark.conf.set("spark.sql.execution.arrow.pyspark.enabled", "true")
+# fall back to the row based path for types arrow cannot convert instead of failing the job
+spark.conf.set("spark.sql.execution.arrow.pyspark.fallback.enabled", "true")
+spark.conf.set("spark.sql.execution.arrow.maxRecordsPerBatch", "10000")
+# repartition merge output by the partition column so small buffered merges do not fan out into tiny files
+spark.conf.set("spark.databricks.delta.merge.repartitionBeforeWrite.enabled", "true")
+
+# COMMAND ----------
+
 # DBTITLE 1,Commit Manager to incrementally commit data to table
 import os
+import queue
+import threading
 import typing
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from typing import Optional, Dict, Any, List
 
+import pandas as pd
 from delta import DeltaTable
 from pyspark.sql import SparkSession
 
@@ -53,9 +68,33 @@ def is_optional(field):
         type(None) in typing.get_args(field)
 
 
+BASE_DATA_TYPE_MAP = {
+    int: LongType(),
+    Optional[int]: LongType(),
+    str: StringType(),
+    Optional[str]: StringType(),
+}
+
+
 @dataclass
 class BaseData:
 
+    def __init_subclass__(cls, **kwargs):
+        # resolve the fields and spark schema once per class instead of reflecting on every call
+        super().__init_subclass__(**kwargs)
+        annotations = cls.__dict__.get("__annotations__", {})
+        fields = []
+        for k, v in annotations.items():
+            data_type = BASE_DATA_TYPE_MAP.get(v)
+            if data_type is None:
+                raise Exception(f"not supported key: {k} data type {type(v)} for class: {cls.__name__}")
+            fields.append(StructField(name=k, dataType=data_type))
+        fields.append(StructField(name=cls.raw_data_key(), dataType=StringType()))
+        fields.append(StructField(name=cls.workspace_name_key(), dataType=StringType()))
+        fields.append(StructField(name=cls.workspace_url_key(), dataType=StringType()))
+        cls._FIELDS = tuple(k for k in annotations.keys() if k != "raw_data")
+        cls._STRUCT_TYPE = StructType(fields=fields)
+
     @staticmethod
     def raw_data_key():
         return "_raw_data"
@@ -70,31 +109,33 @@ class BaseData:
 
     @classmethod
     def to_struct_type(cls):
-        fields = []
-        for k, v in cls.__dict__["__annotations__"].items():
-            if v in [int, Optional[int]]:
-                fields.append(StructField(name=k, dataType=LongType()))
-            elif v in [str, Optional[str]]:
-                fields.append(StructField(name=k, dataType=StringType()))
-            else:
-                raise Exception(f"not supported key: {k} data type {type(v)} for class: {cls.__name__}")
-        fields.append(StructField(name=cls.raw_data_key(), dataType=StringType()))
-        fields.append(StructField(name=cls.workspace_name_key(), dataType=StringType()))
-        fields.append(StructField(name=cls.workspace_url_key(), dataType=StringType()))
-        return StructType(fields=fields)
+        return cls._STRUCT_TYPE
 
     @classmethod
     def from_api_to_dict(cls, api_json: Dict[str, Any], workspace_name: str, workspace_url: str):
-        result_data: Dict[str, Any] = {}
-        for k, v in cls.__dict__["__annotations__"].items():
-            if k != "raw_data":
-                result_data[k] = api_json.get(k, None)
+        result_data: Dict[str, Any] = {k: api_json.get(k, None) for k in cls._FIELDS}
         result_data[cls.raw_data_key()] = json.dumps(api_json)
         result_data[cls.workspace_name_key()] = workspace_name
         result_data[cls.workspace_url_key()] = workspace_url
         return result_data
 
 
+# merges flush small buffers so let delta coalesce the output files on write and compact them afterwards
+DELTA_TABLE_PROPERTIES = {
+    "delta.autoOptimize.optimizeWrite": "true",
+    "delta.autoOptimize.autoCompact": "true",
+}
+
+
+def ensure_delta_table_properties(spark: SparkSession, table: DeltaTable, table_location: str):
+    # tables created before the properties were added get them set once
+    properties = table.detail().select("properties").first()["properties"] or {}
+    missing = {k: v for k, v in DELTA_TABLE_PROPERTIES.items() if properties.get(k) != v}
+    if len(missing) > 0:
+        props_sql = ", ".join(f"'{k}' = '{v}'" for k, v in missing.items())
+        spark.sql(f"ALTER TABLE delta.`{table_location}` SET TBLPROPERTIES ({props_sql})")
+
+
 def get_retry_class(max_retries):
     class LogRetry(Retry):
         """
@@ -114,22 +155,76 @@ def debug(*args):
         print(*args)
 
 
+def iter_prefetched(iterable, max_prefetch: int):
+    # pages have to be fetched in order (each page token comes from the previous page) so one background thread
+    # walks the api while the caller is busy merging; the bounded queue keeps memory in check
+    items = queue.Queue(maxsize=max_prefetch)
+    done = object()
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if put(item) is False:
+                    return
+        finally:
+            put(done)
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        future = executor.submit(produce)
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    break
+                yield item
+        finally:
+            stop.set()
+        future.result()  # surface api errors from the producer
+
+
 class ExportBufferManager:
     # todo: mapping the primary keys
     def __init__(self, name: str, spark: SparkSession, target_table: DeltaTable, primary_keys: List[str],
                  max_buffer_size=10000,
                  debug_every_n_records=1000,
-                 auto_flush=True):
+                 auto_flush=True,
+                 insert_only=False,
+                 target_table_location: Optional[str] = None,
+                 schema: Optional[StructType] = None,
+                 optimize_min_commits=2):
         # TODO: not multi threaded dont try to use this multi threaded no locks
+        if insert_only is True and target_table_location is None:
+            raise ValueError("target_table_location is required for insert only buffers")
         self._name = name
         self._spark = spark
         self._target_table = target_table
+        # resolve the schema once rather than reading the delta log on every flush
+        self._schema = schema or target_table.toDF().schema
         self._max_buffer_size = max_buffer_size
-        self._buffer = []
+        # keyed by primary key so duplicates collapse as they are added (last write wins like the merge)
+        self._buffer: Dict[tuple, dict] = {}
         self._auto_flush = auto_flush
         self._primary_keys = primary_keys
         self._buffer_use_count = 0
         self._debug_every_n_records = debug_every_n_records
+        # insert only buffers (eg: first load into a freshly created table) append instead of merging
+        self._insert_only = insert_only
+        # keys appended so far by an insert only buffer, the buffer only collapses duplicates within one flush
+        self._flushed_keys = set()
+        self._target_table_location = target_table_location
+        # small ingests are not worth paying for a compaction
+        self._optimize_min_commits = optimize_min_commits
+        self._commit_count = 0
 
     def add_many(self, *elements):
         for element in elements:
@@ -139,23 +234,53 @@ class ExportBufferManager:
         if self._auto_flush is True and len(self._buffer) >= self._max_buffer_size:
             self.commit()
 
+    @staticmethod
+    def _sql_literal(value):
+        if isinstance(value, str):
+            return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+        return str(value)
+
+    def _pruning_predicates(self) -> List[str]:
+        # restrict the target side of the merge to the keys in the buffer so delta can skip files
+        predicates = []
+        for k in self._primary_keys:
+            values = {row.get(k) for row in self._buffer.values() if row.get(k) is not None}
+            if len(values) == 0:
+                continue
+            if k == BaseData.workspace_url_key():
+                # partition column
+                predicates.append(f"t.{k} IN ({', '.join(self._sql_literal(v) for v in sorted(values))})")
+            elif all(isinstance(v, int) for v in values):
+                predicates.append(f"t.{k} BETWEEN {min(values)} AND {max(values)}")
+        return predicates
+
     def commit(self):
         print(f"Committing to delta table: ct {self._buffer_use_count}")
         # TODO: error handling
-        input_data = self._spark.createDataFrame(self._buffer, self._target_table.toDF().schema).alias("s") \
-            .drop_duplicates(self._primary_keys)
-        (self._target_table.alias("t")
-         .merge(input_data,
-                " and ".join([f"t.{k} = s.{k}" for k in self._primary_keys]))
-         .whenMatchedUpdateAll()
-         .whenNotMatchedInsertAll()
-         .execute())
+        # build a columnar frame once per flush so spark can convert it via arrow
+        buffer_pdf = pd.DataFrame(list(self._buffer.values()), columns=self._schema.fieldNames())
+        # a flush is at most a few thousand rows, keep it in as few partitions as possible to avoid tiny files
+        input_data = self._spark.createDataFrame(buffer_pdf, self._schema) \
+            .coalesce(max(1, len(self._buffer) // 50000)).alias("s")
+        # a key already written by an earlier flush has to be upserted like the merge would, so that flush merges
+        if self._insert_only is True and self._flushed_keys.isdisjoint(self._buffer.keys()):
+            input_data.write.format("delta").mode("append").save(self._target_table_location)
+        else:
+            (self._target_table.alias("t")
+             .merge(input_data,
+                    " and ".join([f"t.{k} = s.{k}" for k in self._primary_keys] + self._pruning_predicates()))
+             .whenMatchedUpdateAll()
+             .whenNotMatchedInsertAll()
+             .execute())
+        self._commit_count += 1
+        if self._insert_only is True:
+            self._flushed_keys.update(self._buffer.keys())
         # empty the buffer
-        self._buffer = []
+        self._buffer = {}
 
     def add_one(self, element):
         self._check_commit()
-        self._buffer.append(element)
+        self._buffer[tuple(element.get(k) for k in self._primary_keys)] = element
         if self._buffer_use_count % self._debug_every_n_records == 0:
             print(f"Debug [{self._name}]: ct {self._buffer_use_count} / {self._max_buffer_size}")
         self._buffer_use_count += 1
@@ -165,8 +290,13 @@ class ExportBufferManager:
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.commit()
-        print(f"Optimizing Table: {self._name}")
-        self._target_table.optimize().executeCompaction()
+        if self._commit_count < self._optimize_min_commits:
+            print(f"Skipping optimize for table: {self._name} only {self._commit_count} commits")
+            return
+        # z-order by the merge keys so later merges can skip files; the partition column cannot be z-ordered
+        zorder_keys = [k for k in self._primary_keys if k != BaseData.workspace_url_key()]
+        print(f"Optimizing Table: {self._name} zorder by: {zorder_keys}")
+        self._target_table.optimize().executeZOrderBy(*zorder_keys)
 
 
 # COMMAND ----------
@@ -219,20 +349,30 @@ class JobRunsHandler:
             .write \
             .format("delta") \
             .option("mergeSchema", "true") \
+            .options(**DELTA_TABLE_PROPERTIES) \
+            .partitionBy(BaseData.workspace_url_key()) \
             .save(self._target_table_location)
 
     def job_runs_iter(self):
-        for run in client.jobs.list_runs(completed_only="true", run_type=jobs.ListRunsRunType.SUBMIT_RUN,
-                                         expand_tasks="true"):
+        # tasks are kept expanded since the issue scan walks the task cluster definitions
+        runs = client.jobs.list_runs(completed_only="true", run_type=jobs.ListRunsRunType.SUBMIT_RUN,
+                                     expand_tasks="true")
+        for run in iter_prefetched(runs, max_prefetch=self._buffer_size * 2):
             yield run.as_dict()
 
     def run(self):
-        if DeltaTable.isDeltaTable(self._spark, self._target_table_location) is False:
+        # a freshly created table has nothing to merge against so the first load can just append
+        is_new_table = DeltaTable.isDeltaTable(self._spark, self._target_table_location) is False
+        if is_new_table:
             self.create_table()
         tgt = DeltaTable.forPath(self._spark, self._target_table_location)
+        ensure_delta_table_properties(self._spark, tgt, self._target_table_location)
         with ExportBufferManager("Job Runs Buffer", self._spark, tgt,
                                  primary_keys=["job_id", "run_id", JobRunData.workspace_url_key()],
-                                 max_buffer_size=self._buffer_size) as buf:
+                                 max_buffer_size=self._buffer_size,
+                                 insert_only=is_new_table,
+                                 target_table_location=self._target_table_location,
+                                 schema=JobRunData.to_struct_type()) as buf:
             for r in self.job_runs_iter():
                 data = JobRunData.from_api_to_dict(r, self._workspace_name, self._host.rstrip("/"))
                 buf.add_one(data)  # buffers n records and merges into
@@ -259,21 +399,30 @@ class JobsHandler:
             .write \
             .format("delta") \
             .option("mergeSchema", "true") \
+            .options(**DELTA_TABLE_PROPERTIES) \
+            .partitionBy(BaseData.workspace_url_key()) \
             .save(self._target_table_location)
 
     def jobs_iter(self):
-        for job in client.jobs.list(expand_tasks="true"):
+        # tasks are kept expanded since the issue scan walks the task cluster definitions
+        for job in iter_prefetched(client.jobs.list(expand_tasks="true"), max_prefetch=self._buffer_size * 2):
             data = job.as_dict()
             data["name"] = data["settings"]["name"]
             yield data
 
     def run(self):
-        if DeltaTable.isDeltaTable(self._spark, self._target_table_location) is False:
+        # a freshly created table has nothing to merge against so the first load can just append
+        is_new_table = DeltaTable.isDeltaTable(self._spark, self._target_table_location) is False
+        if is_new_table:
             self.create_table()
         tgt = DeltaTable.forPath(self._spark, self._target_table_location)
+        ensure_delta_table_properties(self._spark, tgt, self._target_table_location)
         with ExportBufferManager("Job Definition Buffer", self._spark, tgt,
                                  primary_keys=["job_id", JobData.workspace_url_key()],
-                                 max_buffer_size=self._buffer_size) as buf:
+                                 max_buffer_size=self._buffer_size,
+                                 insert_only=is_new_table,
+                                 target_table_location=self._target_table_location,
+                                 schema=JobData.to_struct_type()) as buf:
             for r in self.jobs_iter():
                 data = JobData.from_api_to_dict(r, self._workspace_name, self._host.rstrip("/"))
                 buf.add_one(data)  # buffers n records and merges into
@@ -283,6 +432,7 @@ class JobsHandler:
 
 # DBTITLE 1,Capture Cluster Data
 import functools
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from typing import List
 
@@ -307,7 +457,8 @@ class ClusterDetailsHandler:
                  cluster_ids: List[str],
                  workspace_url: str,
                  workspace_name: str = "undefined",
-                 buffer_size=300):
+                 buffer_size=300,
+                 max_workers=16):
         self._spark = spark
         self._client = client
         self._target_table_location = target_table_location
@@ -315,12 +466,15 @@ class ClusterDetailsHandler:
         self._host = workspace_url
         self._workspace_name = workspace_name
         self._buffer_size = buffer_size
+        self._max_workers = max_workers
 
     def create_table(self):
         self._spark.createDataFrame([], ClusterDetails.to_struct_type()) \
             .write \
             .format("delta") \
             .option("mergeSchema", "true") \
+            .options(**DELTA_TABLE_PROPERTIES) \
+            .partitionBy(BaseData.workspace_url_key()) \
             .save(self._target_table_location)
 
     @functools.lru_cache(maxsize=512)
@@ -338,18 +492,25 @@ class ClusterDetailsHandler:
         if DeltaTable.isDeltaTable(self._spark, self._target_table_location) is False:
             self.create_table()
         tgt = DeltaTable.forPath(self._spark, self._target_table_location)
+        ensure_delta_table_properties(self._spark, tgt, self._target_table_location)
         with ExportBufferManager("Cluster Details Buffer", self._spark, tgt,
                                  ["cluster_source", "cluster_id",
-                                  ClusterDetails.workspace_url_key()], max_buffer_size=self._buffer_size) as buf:
-            for cluster_id in self._cluster_ids:
-                if self.does_cluster_exist(cluster_id) is False:
-                    debug(f"Cluster: {cluster_id} is most probably missing.")
-                    continue
-                cluster_details = self.get_cluster_info(cluster_id)
-                data = ClusterDetails.from_api_to_dict(cluster_details.as_dict(),
-                                                       self._workspace_name,
-                                                       self._host.rstrip("/"))
-                buf.add_one(data)  # buffers n records and merges into
+                                  ClusterDetails.workspace_url_key()], max_buffer_size=self._buffer_size,
+                                 schema=ClusterDetails.to_struct_type()) as buf:
+            # each lookup is a blocking api round trip so overlap them; the buffer is only touched from this thread
+            with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+                futures = {executor.submit(self.get_cluster_info, cluster_id): cluster_id
+                           for cluster_id in self._cluster_ids}
+                for future in as_completed(futures):
+                    try:
+                        cluster_details = future.result()
+                    except Exception as e:
+                        debug(f"Cluster: {futures[future]} is most probably missing.")
+                        continue
+                    data = ClusterDetails.from_api_to_dict(cluster_details.as_dict(),
+                                                           self._workspace_name,
+                                                           self._host.rstrip("/"))
+                    buf.add_one(data)  # buffers n records and merges into
 
 
 # COMMAND ----------
@@ -389,16 +550,21 @@ print(workflow_submit_runs_table_location)
 
 # COMMAND ----------
 
+import dataclasses
+import functools
 import itertools
+import re
 
 import pandas as pd
 
 from databricks.sdk.service import jobs
 import json
-from typing import Optional, Union, Literal, Iterator, Tuple
-from dataclasses import dataclass, asdict
+from typing import Optional, Union, Literal, Iterator, Tuple, Callable, Any
+from dataclasses import dataclass
 from datetime import datetime
 
+from pyspark.sql.types import StructField, StringType, StructType
+
 
 @dataclass
 class FlaggedIssue:
@@ -432,6 +598,42 @@ class ClusterEntity:
     entity_create_ts_utc: Optional[str] = None
 
 
+def dataclass_to_struct_type(klass) -> StructType:
+    fields = []
+    for field in dataclasses.fields(klass):
+        if field.type in [str, Optional[str]] or typing.get_origin(field.type) is Literal:
+            fields.append(StructField(name=field.name, dataType=StringType()))
+        else:
+            raise Exception(f"not supported key: {field.name} data type {field.type} for class: {klass.__name__}")
+    return StructType(fields=fields)
+
+
+FLAGGED_ISSUE_SCHEMA = dataclass_to_struct_type(FlaggedIssue)
+CLUSTER_ENTITY_SCHEMA = dataclass_to_struct_type(ClusterEntity)
+
+
+def memoize(maxsize: int):
+    # functools.lru_cache wrappers defined in a notebook cannot be pickled to the executors for mapInPandas,
+    # a plain closure over a dict can
+    def decorator(func):
+        cache = {}
+
+        @functools.wraps(func)
+        def wrapper(arg):
+            try:
+                return cache[arg]
+            except KeyError:
+                pass
+            if len(cache) >= maxsize:
+                cache.clear()
+            result = cache[arg] = func(arg)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
 def get_if_job(data: dict) -> Optional[jobs.Job]:
     try:
         return jobs.Job.from_dict(data)
@@ -452,36 +654,65 @@ def get_job_url(job: jobs.Job, workspace_url: str) -> str:
     return f"{workspace_url}/#job/{job.job_id}"
 
 
-def generate_key_value_pairs(data, parent_key=''):
-    if isinstance(data, dict):
-        for key, value in data.items():
-            new_key = f"{parent_key}.{key}" if parent_key else key
-            yield from generate_key_value_pairs(value, new_key)
-    elif isinstance(data, list):
-        for index, value in enumerate(data):
-            new_key = f"{parent_key}[{index}]"
-            yield from generate_key_value_pairs(value, new_key)
-    else:
-        yield parent_key, data
+def generate_key_value_pairs(data, parent_key='', leaf_filter: Optional[Callable[[str, Any], bool]] = None):
+    # iterative depth first walk; children are pushed in reverse so leaves come out in document order
+    stack = [(parent_key, data)]
+    while stack:
+        key, node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend((f"{key}.{k}" if key else k, v) for k, v in reversed(list(node.items())))
+        elif isinstance(node, list):
+            stack.extend((f"{key}[{index}]", v) for index, v in reversed(list(enumerate(node))))
+        elif leaf_filter is None or leaf_filter(key, node):
+            yield key, node
+
+
+def is_issue_leaf(k: str, v: Any) -> bool:
+    # only leaves that find_dbfs_issue, find_runtime_issue or find_cluster_sources can flag
+    return k.endswith(("spark_version", "cluster_source")) or (isinstance(v, str) and ("dbfs" in v or "/mnt/" in v))
+
+
+def is_cluster_id_leaf(k: str, v: Any) -> bool:
+    return k.split(".")[-1] in ["cluster_id", "existing_cluster_id"]
+
+
+@memoize(maxsize=1024)
+def classify_spark_version(v: str) -> Tuple[Tuple[str, str], ...]:
+    # the same handful of spark_version strings repeat across thousands of jobs and runs
+    if v.startswith("custom"):
+        return (("RUNTIME_ISSUE", "UNSUPPORTED_RUNTIME_CUSTOM_IMAGE"),)
+    issues = []
+    try:
+        if "-ml-" in v:
+            issues.append(("RUNTIME_ISSUE", "UNSUPPORTED_RUNTIME_FOR_SHARED_ML"))
+        major_version, minor_version = v.split(".")[:2]
+        version = float(major_version + "." + minor_version)
+        if version < 11.3:
+            issues.append(("RUNTIME_ISSUE", f"UNSUPPORTED_RUNTIME_VERSION_{version}"))
+        elif version < 13.3:
+            issues.append(("POTENTIAL_RUNTIME_ISSUE", f"SUPPORTED_RUNTIME_BUT_SUBOPTIMAL_VERSION_{version}"))
+    except Exception:
+        issues.append(("POTENTIAL_RUNTIME_ISSUE", f"UNKNOWN_RUNTIME_ISSUE_{str(v)}"))
+    return tuple(issues)
 
 
 def find_runtime_issue(k: str, v: Union[str, int, float, bool]) -> Iterator[Optional[Tuple[str, str]]]:
-    if k.endswith("spark_version"):
-        if v.startswith("custom"):
-            yield "RUNTIME_ISSUE", "UNSUPPORTED_RUNTIME_CUSTOM_IMAGE"
-        else:
-            try:
-                if "-ml-" in v:
-                    yield "RUNTIME_ISSUE", "UNSUPPORTED_RUNTIME_FOR_SHARED_ML"
-                major_version = v.split(".")[0]
-                minor_version = v.split(".")[1]
-                version = float(major_version + "." + minor_version)
-                if version < 11.3:
-                    yield "RUNTIME_ISSUE", f"UNSUPPORTED_RUNTIME_VERSION_{version}"
-                elif version < 13.3:
-                    yield "POTENTIAL_RUNTIME_ISSUE", f"SUPPORTED_RUNTIME_BUT_SUBOPTIMAL_VERSION_{version}"
-            except Exception:
-                yield "POTENTIAL_RUNTIME_ISSUE", f"UNKNOWN_RUNTIME_ISSUE_{str(v)}"
+    if k.endswith("spark_version") and isinstance(v, str):
+        yield from classify_spark_version(v)
+
+
+# each alternative is anchored at the start and looks ahead through the whole value so the first alternative that
+# appears anywhere wins, i.e. the same precedence as checking the substrings one after another
+DBFS_ISSUE_RE = re.compile(r"^(?:(?=.*?(?P<mnt>/mnt/))"
+                           r"|(?=.*?(?P<mnt_fuse>/dbfs/mnt))"
+                           r"|(?=.*?(?P<root>dbfs:/))"
+                           r"|(?=.*?(?P<root_fuse>/dbfs/)))", re.DOTALL)
+DBFS_ISSUE_MAP = {
+    "mnt": ("DBFS_MNT_USAGE_FOUND", "DBFS_MNT_USAGE_FOUND"),  # also covers dbfs:/mnt/
+    "mnt_fuse": ("DBFS_MNT_FUSE_USAGE_FOUND", "DBFS_MNT_FUSE_USAGE_FOUND"),
+    "root": ("DBFS_ROOT_USAGE_FOUND", "DBFS_ROOT_USAGE_FOUND"),
+    "root_fuse": ("DBFS_ROOT_FUSE_USAGE_FOUND", "DBFS_ROOT_FUSE_USAGE_FOUND"),
+}
 
 
 def find_dbfs_issue(k: str, v: Union[str, int, float, bool]) -> Iterator[Optional[Tuple[str, str]]]:
@@ -489,14 +720,9 @@ def find_dbfs_issue(k: str, v: Union[str, int, float, bool]) -> Iterator[Optiona
     if k == "" or not isinstance(v, str):
         return
 
-    if k != "" and isinstance(v, str) and ("dbfs:/mnt/" in v or "/mnt/" in v):
-        yield "DBFS_MNT_USAGE_FOUND", "DBFS_MNT_USAGE_FOUND"
-    elif k != "" and isinstance(v, str) and ("/dbfs/mnt" in v):
-        yield "DBFS_MNT_FUSE_USAGE_FOUND", "DBFS_MNT_FUSE_USAGE_FOUND"
-    elif k != "" and isinstance(v, str) and ("dbfs:/" in v):
-        yield "DBFS_ROOT_USAGE_FOUND", "DBFS_ROOT_USAGE_FOUND"
-    elif k != "" and isinstance(v, str) and ("/dbfs/" in v):
-        yield "DBFS_ROOT_FUSE_USAGE_FOUND", "DBFS_ROOT_FUSE_USAGE_FOUND"
+    match = DBFS_ISSUE_RE.match(v)
+    if match is not None:
+        yield DBFS_ISSUE_MAP[match.lastgroup]
 
 
 def find_cluster_sources(k: str, v: Union[str, int, float, bool]) -> Iterator[Optional[Tuple[str, str]]]:
@@ -512,12 +738,17 @@ def iter_flagged_issues(data: dict,
                         entity_url: str,
                         workspace_url: str,
                         ) -> Optional[FlaggedIssue]:
-    for k, v in generate_key_value_pairs(data):
-        for issue_type, issue_detail in itertools.chain(
-                find_dbfs_issue(k, v),
-                find_runtime_issue(k, v),
-                find_cluster_sources(k, v)
-        ):
+    for k, v in generate_key_value_pairs(data, leaf_filter=is_issue_leaf):
+        # route each leaf to the one detector that can flag it
+        if k.endswith("spark_version"):
+            issues = find_runtime_issue(k, v)
+        elif k.endswith("cluster_source"):
+            issues = find_cluster_sources(k, v)
+        elif isinstance(v, str):
+            issues = find_dbfs_issue(k, v)
+        else:
+            continue
+        for issue_type, issue_detail in issues:
             yield FlaggedIssue(
                 entity_type=entity_type,
                 entity_id=entity_id,
@@ -539,26 +770,23 @@ def iter_cluster_ids(data: dict,
                      entity_url: str,
                      workspace_url: str,
                      ) -> Optional[ClusterEntity]:
-    for k, v in generate_key_value_pairs(data):
-        k_last_part = k.split(".")[-1]
-        if k_last_part in ["cluster_id", "existing_cluster_id"]:
-            yield ClusterEntity(
-                entity_type=entity_type,
-                entity_id=entity_id,
-                entity_name=entity_name,
-                entity_cluster_id=v,
-                entity_cluster_field=k,
-                entity_url=entity_url,
-                workspace_url=workspace_url,
-                workspace_id=workspace_name
-            )
-
-
-def get_all_issues_from_job_runs(job_run: jobs.BaseRun, workspace_url: str, cluster_entities: dict) -> Iterator[
-    FlaggedIssue]:
+    for k, v in generate_key_value_pairs(data, leaf_filter=is_cluster_id_leaf):
+        yield ClusterEntity(
+            entity_type=entity_type,
+            entity_id=entity_id,
+            entity_name=entity_name,
+            entity_cluster_id=v,
+            entity_cluster_field=k,
+            entity_url=entity_url,
+            workspace_url=workspace_url,
+            workspace_id=workspace_name
+        )
+
+
+def get_all_issues_from_job_runs(job_run: jobs.BaseRun, data: dict, workspace_url: str,
+                                 cluster_entities: dict) -> Iterator[FlaggedIssue]:
     # handle runtime issue
-    data = job_run.as_dict()
-    attach_cluster_entries(data, cluster_entities)
+    data = attach_cluster_entries(data, cluster_entities)
     yield from iter_flagged_issues(data,
                                    str(job_run.run_id),
                                    job_run.run_name,
@@ -567,10 +795,10 @@ def get_all_issues_from_job_runs(job_run: jobs.BaseRun, workspace_url: str, clus
                                    workspace_url)
 
 
-def get_all_issues_from_job(job: jobs.Job, workspace_url: str, cluster_entities: dict) -> Iterator[FlaggedIssue]:
+def get_all_issues_from_job(job: jobs.Job, data: dict, workspace_url: str,
+                            cluster_entities: dict) -> Iterator[FlaggedIssue]:
     # handle runtime issue
-    data = job.as_dict()
-    attach_cluster_entries(data, cluster_entities)
+    data = attach_cluster_entries(data, cluster_entities)
     yield from iter_flagged_issues(data,
                                    str(job.job_id),
                                    job.settings.name,
@@ -579,9 +807,9 @@ def get_all_issues_from_job(job: jobs.Job, workspace_url: str, cluster_entities:
                                    workspace_url)
 
 
-def get_all_clusters_from_job_runs(job_run: jobs.BaseRun, workspace_url: str) -> Iterator[FlaggedIssue]:
+def get_all_clusters_from_job_runs(job_run: jobs.BaseRun, data: dict, workspace_url: str) -> Iterator[FlaggedIssue]:
     # handle runtime issue
-    yield from iter_cluster_ids(job_run.as_dict(),
+    yield from iter_cluster_ids(data,
                                 str(job_run.run_id),
                                 job_run.run_name,
                                 "SUBMIT_RUN",
@@ -589,9 +817,9 @@ def get_all_clusters_from_job_runs(job_run: jobs.BaseRun, workspace_url: str) ->
                                 workspace_url)
 
 
-def get_all_clusters_from_job(job: jobs.Job, workspace_url: str) -> Iterator[FlaggedIssue]:
+def get_all_clusters_from_job(job: jobs.Job, data: dict, workspace_url: str) -> Iterator[FlaggedIssue]:
     # handle runtime issue
-    yield from iter_cluster_ids(job.as_dict(),
+    yield from iter_cluster_ids(data,
                                 str(job.job_id),
                                 job.settings.name,
                                 "WORKFLOW",
@@ -599,6 +827,8 @@ def get_all_clusters_from_job(job: jobs.Job, workspace_url: str) -> Iterator[Fla
                                 workspace_url)
 
 
+# identical job definitions show up on many rows; the parsed sdk objects are only read so they can be shared
+@memoize(maxsize=4096)
 def parse_json(json_str: str) -> Union[jobs.Job, jobs.BaseRun]:
     raw_data = json.loads(json_str)
     maybe_job_run = get_if_submit_run(raw_data)
@@ -608,6 +838,21 @@ def parse_json(json_str: str) -> Union[jobs.Job, jobs.BaseRun]:
     return maybe_job_run
 
 
+# the dict form of the parsed object is what gets scanned; build it once per distinct json and only read from it
+@memoize(maxsize=4096)
+def parse_json_as_dict(json_str: str) -> Optional[dict]:
+    job_or_run_obj = parse_json(json_str)
+    if job_or_run_obj is None:
+        return None
+    return job_or_run_obj.as_dict()
+
+
+# the same cluster definition is attached to every job that uses it so parse each distinct one once
+@memoize(maxsize=4096)
+def parse_cluster_json(json_str: str) -> dict:
+    return json.loads(json_str)
+
+
 def epoch_to_timestamp_str(timestamp_ms):
     timestamp_seconds = timestamp_ms / 1000
     dt_object = datetime.utcfromtimestamp(timestamp_seconds)
@@ -617,47 +862,84 @@ def epoch_to_timestamp_str(timestamp_ms):
 
 
 def attach_cluster_entries(raw_data, cluster_entries):
+    # shallow copy so the cached dict from parse_json_as_dict is left untouched
     if cluster_entries is not None:
-        raw_data["_internal_associated_clusters_mapping"] = {k: json.loads(v) for k, v in cluster_entries.items()}
+        return {**raw_data,
+                "_internal_associated_clusters_mapping": {k: parse_cluster_json(v)
+                                                          for k, v in cluster_entries.items()}}
+    return raw_data
+
+
+# raw json that matches none of these cannot produce an issue from find_dbfs_issue, find_runtime_issue or
+# find_cluster_sources
+ISSUE_CANDIDATE_PATTERN = r"dbfs:/|/dbfs/|/mnt/|spark_version|cluster_source"
 
 
 def pdf_to_issues(data: pd.DataFrame) -> pd.DataFrame:
     resp = []
-    for row in data.to_dict("records"):
-        raw_json = row.get("_raw_data")
-        workspace_url = row.get("_workspace_url")
-        cluster_entities = row.get("_cluster_entries", None)
+    # vectorised pre-filter so only rows that can contain an issue get parsed and walked in python
+    candidates = data["_raw_data"].str.contains(ISSUE_CANDIDATE_PATTERN, regex=True, na=False)
+    if "_cluster_entries" in data.columns:
+        # attached cluster definitions are scanned as well
+        candidates = candidates | data["_cluster_entries"].notna()
+    data = data[candidates]
+    # iterate the needed columns directly rather than materializing every row as a dict
+    cluster_entries_col = data["_cluster_entries"].values if "_cluster_entries" in data.columns \
+        else itertools.repeat(None, len(data))
+    for raw_json, workspace_url, cluster_entities in zip(data["_raw_data"].values,
+                                                         data["_workspace_url"].values,
+                                                         cluster_entries_col):
         job_or_run_obj = parse_json(raw_json)
         if isinstance(job_or_run_obj, jobs.Job):
-            for iss in get_all_issues_from_job(job_or_run_obj, workspace_url, cluster_entities):
-                if iss is not None:
-                    iss.entity_create_ts_utc = epoch_to_timestamp_str(job_or_run_obj.created_time)
-                    resp.append(asdict(iss))
+            create_epoch = job_or_run_obj.created_time
+            issues = get_all_issues_from_job(job_or_run_obj, parse_json_as_dict(raw_json), workspace_url,
+                                             cluster_entities)
         elif isinstance(job_or_run_obj, jobs.BaseRun):
-            for iss in get_all_issues_from_job_runs(job_or_run_obj, workspace_url, cluster_entities):
-                if iss is not None:
-                    iss.entity_create_ts_utc = epoch_to_timestamp_str(job_or_run_obj.start_time)
-                    resp.append(asdict(iss))
-    return pd.DataFrame(resp)
+            create_epoch = job_or_run_obj.start_time
+            issues = get_all_issues_from_job_runs(job_or_run_obj, parse_json_as_dict(raw_json), workspace_url,
+                                                  cluster_entities)
+        else:
+            continue
+        create_ts = None
+        for iss in issues:
+            if iss is not None:
+                create_ts = create_ts or epoch_to_timestamp_str(create_epoch)
+                iss.entity_create_ts_utc = create_ts
+                # flat dataclass so no need for the deep copy asdict does
+                resp.append(iss.__dict__)
+    return pd.DataFrame(resp, columns=FLAGGED_ISSUE_SCHEMA.fieldNames())
 
 
 def pdf_to_cluster_ids(data: pd.DataFrame) -> pd.DataFrame:
     resp = []
-    for row in data.to_dict("records"):
-        raw_json = row.get("_raw_data")
-        workspace_url = row.get("_workspace_url")
+    for raw_json, workspace_url in zip(data["_raw_data"].values, data["_workspace_url"].values):
         job_or_run_obj = parse_json(raw_json)
         if isinstance(job_or_run_obj, jobs.Job):
-            for cluster in get_all_clusters_from_job(job_or_run_obj, workspace_url):
-                if cluster is not None:
-                    cluster.entity_create_ts_utc = epoch_to_timestamp_str(job_or_run_obj.created_time)
-                    resp.append(asdict(cluster))
+            create_epoch = job_or_run_obj.created_time
+            clusters = get_all_clusters_from_job(job_or_run_obj, parse_json_as_dict(raw_json), workspace_url)
         elif isinstance(job_or_run_obj, jobs.BaseRun):
-            for cluster in get_all_clusters_from_job_runs(job_or_run_obj, workspace_url):
-                if cluster is not None:
-                    cluster.entity_create_ts_utc = epoch_to_timestamp_str(job_or_run_obj.start_time)
-                    resp.append(asdict(cluster))
-    return pd.DataFrame(resp)
+            create_epoch = job_or_run_obj.start_time
+            clusters = get_all_clusters_from_job_runs(job_or_run_obj, parse_json_as_dict(raw_json), workspace_url)
+        else:
+            continue
+        create_ts = None
+        for cluster in clusters:
+            if cluster is not None:
+                create_ts = create_ts or epoch_to_timestamp_str(create_epoch)
+                cluster.entity_create_ts_utc = create_ts
+                resp.append(cluster.__dict__)
+    return pd.DataFrame(resp, columns=CLUSTER_ENTITY_SCHEMA.fieldNames())
+
+
+# run the conversions on the executors batch by batch instead of collecting everything to the driver
+def issues_udf(batch_iter: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    for pdf in batch_iter:
+        yield pdf_to_issues(pdf)
+
+
+def cluster_ids_udf(batch_iter: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    for pdf in batch_iter:
+        yield pdf_to_cluster_ids(pdf)
 
 
 # COMMAND ----------
@@ -665,18 +947,25 @@ def pdf_to_cluster_ids(data: pd.DataFrame) -> pd.DataFrame:
 # DBTITLE 1,Retrieve all Used Clusters
 cluster_usage_table_location = str(dbfs_folder_path / "analysis/clusters_used/delta")
 
-spark.createDataFrame(pdf_to_cluster_ids(spark.sql(f"""
+(spark.sql(f"""
   SELECT _raw_data, _workspace_url FROM delta.`{workflows_table_location}` UNION ALL
   SELECT _raw_data, _workspace_url FROM delta.`{workflow_submit_runs_table_location}`
-""").toPandas())).write.option("overwriteSchema", "true").mode("overwrite").save(cluster_usage_table_location)
+""").mapInPandas(cluster_ids_udf, schema=CLUSTER_ENTITY_SCHEMA)
+ .write
+ .option("overwriteSchema", "true")
+ .mode("overwrite")
+ .save(cluster_usage_table_location)
+ )
 
 print(cluster_usage_table_location)
 
 # COMMAND ----------
 
+# filter empty ids in sql so only usable ids reach the driver
 cluster_ids = [row.entity_cluster_id for row in spark.sql(f"""
     SELECT distinct entity_cluster_id FROM delta.`{cluster_usage_table_location}`
-""").collect() if row.entity_cluster_id not in ["", None]]
+    WHERE entity_cluster_id IS NOT NULL AND entity_cluster_id <> ''
+""").collect()]
 cluster_ids
 
 # COMMAND ----------
@@ -731,13 +1020,13 @@ workflow_clusters AS (
 )
 ,
 jobs_with_clusters AS (
-  SELECT a.*, b.cluster_mapping as _cluster_entries
+  SELECT a._raw_data, a._workspace_url, b.cluster_mapping as _cluster_entries
     FROM delta.`{workflows_table_location}` a
     LEFT OUTER JOIN workflow_clusters b
     ON a.job_id = b.entity_id
 ),
 submit_runs_with_clusters AS (
-  SELECT a.*, b.cluster_mapping as _cluster_entries
+  SELECT a._raw_data, a._workspace_url, b.cluster_mapping as _cluster_entries
     FROM delta.`{workflow_submit_runs_table_location}` a
     LEFT OUTER JOIN submit_run_clusters b
     ON a.run_id = b.entity_id
@@ -748,7 +1037,7 @@ SELECT _raw_data, _workspace_url, _cluster_entries FROM submit_runs_with_cluster
           """)
 
 compute_issues_table_location = str(dbfs_folder_path / "analysis/compute_issues/delta")
-(spark.createDataFrame(pdf_to_issues(query_df.toPandas()))
+(query_df.mapInPandas(issues_udf, schema=FLAGGED_ISSUE_SCHEMA)
  .write
  .option("overwriteSchema", "true")
  .mode("overwrite")
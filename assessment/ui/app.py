@@ -1,11 +1,19 @@
+import functools
+import hashlib
 import os
 import tempfile
 import traceback
 from datetime import datetime
 from pathlib import Path
-from typing import Callable, cast, List, Optional
+from typing import Callable, cast, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
+import plotly.colors
+import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 import solara
 import solara.lab
 from solara.components.file_drop import FileInfo
@@ -20,7 +28,47 @@ from assessment.ui.mounts.code_replace import CodeFindAndReplace
 from assessment.ui.mounts.mount_scanner_v1 import MountScanner
 from assessment.ui.mounts.mount_scanner_v2 import MountScannerV2
 from assessment.ui.settings import Settings
-from assessment.ui.state import workspace_conf_ini, workspace_url
+from assessment.ui.state import workspace_conf_ini, get_workspace_url
+
+
+MAX_PIE_SLICES = 20
+
+
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    # nested values are written as their python repr like to_csv so the file can still be read back
+    nested_columns = {c: df[c].map(lambda v: str(v) if isinstance(v, (dict, list, tuple, set)) else v)
+                      for c in df.columns if df[c].dtype == object}
+    try:
+        table = pa.Table.from_pandas(df.assign(**nested_columns), preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # mixed type columns cannot be converted, let pandas format them
+        return df.to_csv(index=False).encode("utf-8")
+    # arrow formats the csv in c++ instead of cell by cell in python
+    buf = pa.BufferOutputStream()
+    pa_csv.write_csv(table, buf)
+    return buf.getvalue().to_pybytes()
+
+
+def to_parquet_bytes(df: pd.DataFrame, workspace_url: str) -> bytes:
+    # write straight from an arrow table, the constant workspace url is added as a single entry dictionary column
+    # so it is one string plus a byte per row rather than the url copied into every row
+    table = pa.Table.from_pandas(df.drop(columns=['workspace_url'], errors='ignore'), preserve_index=False)
+    workspace_url_col = pa.DictionaryArray.from_arrays(pa.array(np.zeros(table.num_rows, dtype=np.int8)),
+                                                       pa.array([workspace_url], pa.string()))
+    table = table.append_column('workspace_url', workspace_url_col)
+    # also in the file metadata so readers can get it without scanning the column
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}),
+                                           b'workspace_url': workspace_url.encode('utf-8')})
+    buf = pa.BufferOutputStream()
+    pq.write_table(table, buf, compression='zstd', compression_level=3)
+    return buf.getvalue().to_pybytes()
+
+
+# the current user does not change for the life of the app, avoid a round trip to the workspace on every scan
+@functools.lru_cache(maxsize=4)
+def get_current_user_info(profile: str) -> Tuple[str, str]:
+    curr_user = get_ws_client(default_profile=profile).current_user.me()
+    return curr_user.display_name, curr_user.user_name
 
 
 @solara.component
@@ -39,35 +87,68 @@ def RepoScanner(mounts: pd.DataFrame, set_mounts: Callable[[pd.DataFrame], None]
     # user, set_user = solara.use_state("")
     # token, set_token = solara.use_state("")
     curr_file, set_curr_file = solara.use_state("")
-    uploaded_file_contents, set_uploaded_file_contents = solara.use_state(cast(Optional[bytes], None))
+    # (content hash, parsed mounts) of the last uploaded file
+    uploaded_mounts, set_uploaded_mounts = solara.use_state(cast(Tuple[Optional[bytes], Optional[pd.DataFrame]],
+                                                                 (None, None)))
 
     issues: pd.DataFrame
     set_issues: Callable[[pd.DataFrame], None]
 
-    def get_raw_data(csv=False):
-        df_copy = issues.copy(deep=True)
-        df_copy['workspace_url'] = workspace_url
-        if csv is True:
-            return df_copy.to_csv(index=False)
+    # serialized downloads are kept per issues frame so repeated clicks do not re-serialize
+    raw_data_cache = solara.use_memo(lambda: {}, [id(issues)])
 
-        return df_copy.to_parquet(index=False)
+    def get_raw_data(csv=False):
+        if csv not in raw_data_cache:
+            if csv is True:
+                # assign only adds the column to a new frame instead of deep copying all the data
+                raw_data_cache[csv] = to_csv_bytes(issues.assign(workspace_url=get_workspace_url()))
+            else:
+                raw_data_cache[csv] = to_parquet_bytes(issues, get_workspace_url())
+        return raw_data_cache[csv]
 
     def get_plotly_mounts():
-        import plotly.express as px
         # Group and count the occurrences of each issue type and detail combination
-        grouped_counts = issues.groupby(['issue_type', 'issue_detail']).size().reset_index(name='count')
+        # only counts are needed so factorize the pairs into integer ids and bincount them instead of a groupby
+        type_codes, type_uniques = pd.factorize(issues['issue_type'])
+        detail_codes, detail_uniques = pd.factorize(issues['issue_detail'])
+        # like groupby, rows with a missing key are not counted
+        valid = (type_codes >= 0) & (detail_codes >= 0)
+        n_details = max(len(detail_uniques), 1)
+        pair_codes, pair_uniques = pd.factorize(type_codes[valid] * n_details + detail_codes[valid])
+        grouped_counts = pd.DataFrame({
+            'issue_type': np.asarray(type_uniques)[pair_uniques // n_details],
+            'issue_detail': np.asarray(detail_uniques)[pair_uniques % n_details],
+            'count': np.bincount(pair_codes, minlength=len(pair_uniques)),
+        })
+
+        # Combine issue_type and issue_detail columns for coloring, only done once per group not per issue
+        grouped_counts['color'] = grouped_counts['issue_type'].astype(str) + ' - ' + \
+            grouped_counts['issue_detail'].astype(str)
 
-        # Combine issue_type and issue_detail columns for coloring
-        grouped_counts['color'] = grouped_counts['issue_type'] + ' - ' + grouped_counts['issue_detail']
+        # past a few dozen slices the chart is unreadable and slow to draw so fold the smallest into one slice
+        if grouped_counts.shape[0] > MAX_PIE_SLICES:
+            top = grouped_counts.nlargest(MAX_PIE_SLICES, 'count')
+            n_other = grouped_counts.shape[0] - top.shape[0]
+            other = pd.DataFrame([{'issue_type': 'OTHER', 'issue_detail': 'OTHER',
+                                   'color': f'Other ({n_other} categories)',
+                                   'count': grouped_counts['count'].sum() - top['count'].sum()}])
+            grouped_counts = pd.concat([top, other], ignore_index=True)
 
-        # Create a pie chart using Plotly Express
-        fig = px.pie(grouped_counts, values='count', names='color', title="Issue Type and Detail Breakdown")
+        # Create a pie chart, the data is already aggregated so build the trace directly instead of through
+        # plotly express
+        fig = go.Figure(data=[go.Pie(labels=grouped_counts['color'], values=grouped_counts['count'], sort=False)])
+        # keep the legend / zoom state when the figure is rebuilt and skip transition animations
+        fig.update_layout(title="Issue Type and Detail Breakdown", uirevision='issues', transition_duration=0)
 
         # Update color scale to match the issue types
-        color_scale = px.colors.qualitative.Set1[:len(grouped_counts['issue_type'].unique())]
+        color_scale = plotly.colors.qualitative.Set1[:len(grouped_counts['issue_type'].unique())]
         fig.update_traces(marker=dict(colors=color_scale))
         return fig
 
+    # only rebuild the chart when the issues change, not on every render
+    issues_fig = solara.use_memo(lambda: get_plotly_mounts() if issues is not None and issues.shape[0] > 0 else None,
+                                 [id(issues)])
+
     def get_issues():
         if repo_url is None or repo_url == "":
             set_error("Please enter a repo url")
@@ -75,10 +156,7 @@ def RepoScanner(mounts: pd.DataFrame, set_mounts: Callable[[pd.DataFrame], None]
         set_error("")
         try:
             set_loading(True)
-            ws_client = get_ws_client(default_profile="uc-assessment-azure")
-            curr_user = ws_client.current_user.me()
-            user_name = curr_user.display_name
-            email = curr_user.user_name
+            user_name, email = get_current_user_info("uc-assessment-azure")
             with tempfile.TemporaryDirectory() as path:
                 with git_repo(repo_url, None, path, email=email, full_name=user_name, delete=True,
                               username=user, password=token):
@@ -88,10 +166,7 @@ def RepoScanner(mounts: pd.DataFrame, set_mounts: Callable[[pd.DataFrame], None]
                                                set_max_prog=set_max_progress,
                                                set_curr_prog=set_progress)
                     # this identifies all the issues in the repo
-                    _issues = []
-                    for iss in scan.iter_issues():
-                        _issues.append(iss)
-                    set_issues(Issue.issues_to_df(_issues))
+                    set_issues(Issue.issues_to_df(scan.iter_issues()))
         except Exception as e:
             log.error(traceback.format_exc())
             set_error(str(e))
@@ -103,8 +178,16 @@ def RepoScanner(mounts: pd.DataFrame, set_mounts: Callable[[pd.DataFrame], None]
                     "databricks/mlflow-tracking, databricks-datasets, databricks/mlflow-registry, databricks-results.")
 
         def on_file(file_contents: FileInfo):
-            set_mounts(pd.DataFrame(Mount.from_csv_bytes(file_contents.get("data"))))
-            set_uploaded_file_contents(file_contents.get("data"))
+            data = file_contents.get("data")
+            # dropping the same file again does not need to parse it again
+            content_hash = hashlib.blake2b(data, digest_size=16).digest()
+            cached_hash, cached_mounts = uploaded_mounts
+            if content_hash == cached_hash:
+                set_mounts(cached_mounts)
+                return
+            mounts_df = Mount.dataframe_from_csv_bytes(data)
+            set_uploaded_mounts((content_hash, mounts_df))
+            set_mounts(mounts_df)
 
         solara.FileDrop(
             label="Drag and drop a mounts csv file here.",
@@ -113,7 +196,7 @@ def RepoScanner(mounts: pd.DataFrame, set_mounts: Callable[[pd.DataFrame], None]
         )
 
         solara.Button("Reload File",
-                      on_click=lambda: set_mounts(pd.DataFrame(Mount.from_csv_bytes(uploaded_file_contents))))
+                      on_click=lambda: set_mounts(uploaded_mounts[1]))
 
         if mounts is not None and mounts.shape[0] > 0:
             solara.Info(f"Note: Using {mounts.shape[0]} mounts.")
@@ -140,10 +223,12 @@ def RepoScanner(mounts: pd.DataFrame, set_mounts: Callable[[pd.DataFrame], None]
                                     data=lambda: get_raw_data(csv=True))
             with solara.lab.Tabs():
                 with solara.lab.Tab("Raw Data"):
-                    solara.DataFrame(issues)
+                    # the table is paged on the server so only the visible page is sent to the browser
+                    solara.Text(f"{issues.shape[0]} issues found, use the downloads for the full data.")
+                    solara.DataFrame(issues, items_per_page=50)
                 if issues.shape[0] > 0:
                     with solara.lab.Tab("Issue Breakdown Pie Chart"):
-                        solara.FigurePlotly(get_plotly_mounts())
+                        solara.FigurePlotly(issues_fig)
 
 
 def make_logger_file_name(timestamp: str = None):
@@ -1,4 +1,9 @@
+import functools
+import hashlib
+import threading
 import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
@@ -8,12 +13,12 @@ import pandas as pd
 import solara
 import solara.lab
 
-from assessment.code_scanner.utils import get_db_base_path, zip_bytes
+from assessment.code_scanner.utils import get_db_base_path, zip_bytes, log
 from assessment.jobs.assets import AssetManager
 from assessment.jobs.manager import JobRunResults, BaseJobsResultsManager, ComputeAnalysisJob
 from assessment.jobs.repository import JobRunRepository, JobRun
 from assessment.ui.components.valid_client_checklist import ValidClientCheckList
-from assessment.ui.models import WorkspaceConf
+from assessment.ui.models import workspace_conf_from_ini
 from assessment.ui.state import workspace_conf_ini
 
 
@@ -32,12 +37,10 @@ def Space():
 
 
 def dataframe_modified(df, optional_columns=None,
-                       drop_columns=None, copy_deep=True
+                       drop_columns=None
                        ):
-    # Convert HTML columns to Markdown link fields using link_mapping
+    # projections and assign return new frames that share the untouched columns so the input is never mutated
     new_df = df
-    if copy_deep is True:
-        new_df = df.copy(deep=True)
 
     # Filter columns based on optional_columns
     if optional_columns:
@@ -45,23 +48,24 @@ def dataframe_modified(df, optional_columns=None,
     if drop_columns:
         new_df = new_df.drop(columns=drop_columns)
 
-    new_df['start_time'] = pd.to_datetime(new_df['start_time'])  # Convert start_time to datetime
+    if not pd.api.types.is_datetime64_any_dtype(new_df['start_time']):
+        new_df = new_df.assign(start_time=pd.to_datetime(new_df['start_time']))  # Convert start_time to datetime
 
     # Sort and add last_n_runs column
     new_df = new_df.sort_values(by=['workspace_url', 'start_time'], ascending=[True, False])
-    new_df['last_n_runs'] = new_df.groupby('workspace_url').cumcount() + 1
-
-    return new_df
+    return new_df.assign(last_n_runs=new_df.groupby('workspace_url').cumcount() + 1)
 
 
 def get_clients_urls_clusters(selected_ws: solara.Reactive[List[str]]):
-    wc = WorkspaceConf.from_ini(workspace_conf_ini.value)
-    clients = [config.get_ws_client() for key, config in wc.configs.items() if key in selected_ws.value]
-    urls = [config.get_ws_client().config.host for key, config in wc.configs.items() if key in selected_ws.value]
-    cluster_dict = {config.get_ws_client().config.host: config.cluster_id
-                    for key, config in wc.configs.items() if key in selected_ws.value}
-    workspace_alias_mapping = {config.get_ws_client().config.host: key
-                               for key, config in wc.configs.items() if key in selected_ws.value}
+    wc = workspace_conf_from_ini(workspace_conf_ini.value)
+    selected = set(selected_ws.value)
+    # build each selected client once and derive everything else from it
+    built = [(key, config.get_ws_client(), config.cluster_id)
+             for key, config in wc.configs.items() if key in selected]
+    clients = [client for _, client, _ in built]
+    urls = [client.config.host for _, client, _ in built]
+    cluster_dict = {client.config.host: cluster_id for _, client, cluster_id in built}
+    workspace_alias_mapping = {client.config.host: key for key, client, _ in built}
     return clients, urls, cluster_dict, workspace_alias_mapping
 
 
@@ -69,41 +73,103 @@ db_base_path = Path(get_db_base_path()).parent
 
 repo = JobRunRepository(db_base_path / "test.db")  # create instance of JobRunRepository
 
+MIN_REFRESH_INTERVAL_S = 5
+MAX_REFRESH_INTERVAL_S = 30
+
+
+def wait_for_refresh(interval: float, refresh_event: threading.Event, cancel: threading.Event) -> bool:
+    # wait in short slices so a cancelled poller stops promptly instead of sleeping out its interval
+    deadline = time.monotonic() + interval
+    while not cancel.is_set():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        if refresh_event.wait(timeout=min(remaining, 1)):
+            refresh_event.clear()
+            return True
+    return False
+
+
+def next_refresh_interval(interval: float, changed: bool) -> float:
+    # poll quickly while things are changing and back off exponentially while they are not
+    if changed is True:
+        return MIN_REFRESH_INTERVAL_S
+    return min(interval * 2, MAX_REFRESH_INTERVAL_S)
+
+
+def frame_digest(df: pd.DataFrame) -> bytes:
+    return hashlib.blake2b(pd.util.hash_pandas_object(df, index=False).values.tobytes()).digest()
+
 @solara.component
 def AssessmentBlock(assessment_name: str, selected_ws: solara.Reactive[List[str]],
                     manager_klass: Type[BaseJobsResultsManager]):
     # assessment_rows, set_assessment_rows = solara.use_state(cast(List[AssessmentRow], []))
     run_history, set_run_history = solara.use_state(cast(pd.DataFrame, None))
     latest_runs, set_latest_runs = solara.use_state(cast(pd.DataFrame, None))
-    loading, set_loading = solara.use_state(False)
     results_loading, set_results_loading = solara.use_state(False)
     assessment_loading, set_assessment_loading = solara.use_state(False)
     run_history_msg, set_run_history_msg = solara.use_state("")
     runs_results, set_runs_results = solara.use_state(cast(List[JobRunResults], None))
+    # set after a user action in this session so its poller refreshes right away instead of waiting out the interval
+    refresh_event = solara.use_memo(threading.Event, [])
 
-    def get_assessment_rows():
-        while True:
-            set_loading(True)
-            clients, urls, cluster_dict, _ = get_clients_urls_clusters(selected_ws)
-            manager = manager_klass(clients, repo, cluster_dict)
-            set_run_history(JobRun.to_dataframe(
-                repo.get_latest_run_results(urls,
-                                            [manager.job_name()],
-                                            100),
-                json_friendly=True,
-                no_millis=True
-            ))
-            set_latest_runs(
-                JobRun.to_dataframe(
+    # zipped results are kept per retrieval so re-renders don't serialize every result again
+    results_zip_cache = solara.use_memo(lambda: {}, [id(runs_results)])
+
+    def get_result_zip(run_result: JobRunResults) -> bytes:
+        if run_result.name not in results_zip_cache:
+            results_zip_cache[run_result.name] = zip_bytes(run_result.data.to_csv(index=False),
+                                                           f"{run_result.name}.csv", compresslevel=1)
+        return results_zip_cache[run_result.name]
+
+    def get_assessment_rows(cancel: threading.Event):
+        # a single poller refreshes run status and then reads the history back in one pass,
+        # solara sets cancel when the selection changes or the component unmounts
+        # repo = JobRunRepository(db_base_path / "test.db")
+        if not selected_ws.value:
+            # nothing to poll, the thread is restarted when the selection changes
+            set_run_history(None)
+            set_latest_runs(None)
+            set_run_history_msg("")
+            return
+        interval = MIN_REFRESH_INTERVAL_S
+        last_digest = None
+        while not cancel.is_set():
+            changed = False
+            try:
+                clients, urls, cluster_dict, _ = get_clients_urls_clusters(selected_ws)
+                manager = manager_klass(clients, repo, cluster_dict)
+                set_run_history_msg(
+                    f"Updating assessment status for workspaces: {selected_ws.value} "
+                    f"last refreshed: {datetime.utcnow()}")
+                try:
+                    changed = manager.update_run_status() > 0
+                except Exception:
+                    # a failed status update should not stop the run history from refreshing
+                    log.error(traceback.format_exc())
+                history = JobRun.to_dataframe(
                     repo.get_latest_run_results(urls,
                                                 [manager.job_name()],
-                                                1),
+                                                100),
                     json_friendly=True,
                     no_millis=True
                 )
-            )
-            set_loading(False)
-            time.sleep(5)
+                digest = frame_digest(history)
+                if digest != last_digest:
+                    # only push new frames when the runs changed so idle ticks do not re-render the tables,
+                    # sort and rank once per fetch instead of once per tab on every render,
+                    # the latest run per workspace is simply the first ranked row
+                    history = dataframe_modified(history, drop_columns=["id"])
+                    set_run_history(history)
+                    set_latest_runs(history[history["last_n_runs"] == 1])
+                    changed = True
+                last_digest = digest
+            except Exception:
+                # keep the only poller alive through transient failures, the backoff below spaces out the retries
+                log.error(traceback.format_exc())
+            interval = next_refresh_interval(interval, changed)
+            if wait_for_refresh(interval, refresh_event, cancel) is True:
+                interval = MIN_REFRESH_INTERVAL_S
 
     def submit_assessment():
         set_assessment_loading(True)
@@ -111,20 +177,9 @@ def AssessmentBlock(assessment_name: str, selected_ws: solara.Reactive[List[str]
         # repo = JobRunRepository(db_base_path / "test.db")
         manager = manager_klass(clients, repo, cluster_dict)
         manager.create_runs(urls, workspace_alias_mapping)
+        refresh_event.set()
         set_assessment_loading(False)
 
-    def update_assessment():
-        # repo = JobRunRepository(db_base_path / "test.db")
-        while True:
-            set_loading(True)
-            clients, urls, cluster_dict, _ = get_clients_urls_clusters(selected_ws)
-            manager = manager_klass(clients, repo, cluster_dict)
-            set_run_history_msg(
-                f"Updating assessment status for workspaces: {selected_ws.value} last refreshed: {datetime.utcnow()}")
-            manager.update_run_status()
-            set_loading(False)
-            time.sleep(5)
-
     def get_run_results():
         clients, urls, cluster_dict, _ = get_clients_urls_clusters(selected_ws)
         set_results_loading(True)
@@ -135,7 +190,6 @@ def AssessmentBlock(assessment_name: str, selected_ws: solara.Reactive[List[str]
         set_results_loading(False)
 
     solara.use_thread(get_assessment_rows, [selected_ws.value])
-    solara.use_thread(update_assessment, [selected_ws.value])
 
     with solara.Details("", expand=True):
         ValidClientCheckList(selected_ws, clusters=True, warning_if_none_selected=True)
@@ -156,8 +210,7 @@ def AssessmentBlock(assessment_name: str, selected_ws: solara.Reactive[List[str]
                         solara.Info(run_history_msg, style="margin-top: 10px;")
                     solara.provide_cross_filter()
                     with solara.VBox():
-                        df = dataframe_modified(latest_runs, drop_columns=["id"])
-                        solara.DataFrame(df)
+                        solara.DataFrame(latest_runs)
                 else:
                     solara.Info("No runs found.", style="margin-top: 10px;")
             with solara.lab.Tab("Run History"):
@@ -167,8 +220,7 @@ def AssessmentBlock(assessment_name: str, selected_ws: solara.Reactive[List[str]
                         solara.Info(run_history_msg, style="margin-top: 10px;")
                     solara.provide_cross_filter()
                     with solara.VBox():
-                        df = dataframe_modified(run_history, drop_columns=["id"])
-                        solara.DataFrame(df, items_per_page=20)
+                        solara.DataFrame(run_history, items_per_page=20)
                 else:
                     solara.Info("No runs found.", style="margin-top: 10px;")
             with solara.lab.Tab("Run Results"):
@@ -187,9 +239,10 @@ def AssessmentBlock(assessment_name: str, selected_ws: solara.Reactive[List[str]
                 if runs_results is not None:
                     for run_result in runs_results:
                         with solara.Card(run_result.name):
+                            # bind the result now, a bare lambda would see the last result of the loop
                             solara.FileDownload(
-                                data=lambda: zip_bytes(run_result.data.to_csv(), f"{run_result.name}.zip"),
-                                filename=f"{run_result.name}.csv")
+                                data=functools.partial(get_result_zip, run_result),
+                                filename=f"{run_result.name}.zip")
                             solara.DataFrame(run_result.data)
 
 
@@ -203,11 +256,20 @@ def AssetsBlock(selected_ws: solara.Reactive[List[str]]):
         def upload_all_assets():
             set_loading(True)
             clients, _, _, _ = get_clients_urls_clusters(selected_ws)
-            for client in clients:
-                set_workspace_url(client.config.host)
-                AssetManager(client).upload_all()
-            set_workspace_url("")
-            set_loading(False)
+            set_workspace_url(", ".join(client.config.host for client in clients))
+            try:
+                if clients:
+                    # workspaces are independent so upload to all of them at once
+                    with ThreadPoolExecutor(max_workers=min(8, len(clients))) as executor:
+                        futures = {executor.submit(AssetManager(client).upload_all): client for client in clients}
+                        pending = {client.config.host for client in clients}
+                        for future in as_completed(futures):
+                            pending.discard(futures[future].config.host)
+                            set_workspace_url(", ".join(sorted(pending)))
+                            future.result()
+            finally:
+                set_workspace_url("")
+                set_loading(False)
 
         solara.Button("Upload All Assets", icon_name="cloud_upload",
                       on_click=upload_all_assets,
@@ -1,10 +1,67 @@
+import functools
+import html
 import os
+import tarfile
+import tempfile
+import zipfile
+from collections import deque
 from pathlib import Path
-from typing import List, cast, Optional
+from typing import List, cast, Optional, Tuple
 
 import solara
 
-from assessment.code_scanner.utils import zip_bytes
+try:
+    # optional, offers a multithreaded zstd tar download next to the zip
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from assessment.code_scanner.utils import zip_file
+
+
+def walk_files(dir_path: str, max_count: Optional[int] = None) -> List[Tuple[str, str]]:
+    # stops once there are more than max_count files
+    files = []
+    stack = [dir_path]
+    while stack:
+        with os.scandir(stack.pop()) as it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                # (file path, name in the archive)
+                files.append((entry.path, entry.path[len(dir_path) + 1:]))
+                if max_count is not None and len(files) > max_count:
+                    return files
+    return files
+
+
+# the file count is keyed on the directory mtime so re-renders of the same selected directory do not walk the tree
+# again, changes inside subdirectories do not touch that mtime so downloads always walk the tree themselves
+@functools.lru_cache(maxsize=32)
+def count_files(dir_path: str, mtime_ns: int, max_count: int) -> int:
+    return len(walk_files(dir_path, max_count))
+
+
+# keyed on mtime and size so refreshing an unchanged log does not read it again
+@functools.lru_cache(maxsize=8)
+def last_lines(file_path: str, mtime_ns: int, size: int, n_lines: int, block_size: int = 1 << 20) -> str:
+    # read blocks backwards from the end until enough lines are found instead of reading the whole log
+    with open(file_path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        blocks = deque()
+        newlines = 0
+        while pos > 0 and newlines <= n_lines:
+            read_size = min(block_size, pos)
+            pos -= read_size
+            f.seek(pos)
+            block = f.read(read_size)
+            newlines += block.count(b"\n")
+            blocks.appendleft(block)
+    # split the raw bytes and decode only the kept tail, undecodable bytes are replaced rather than raising
+    lines = b"".join(blocks).splitlines(keepends=True)
+    return b"".join(lines[-n_lines:]).decode("utf-8", errors="replace")
 
 
 @solara.component
@@ -13,28 +70,30 @@ def LogBrowser(exec_base_path, exclude_prefixes: List[str] = None):
     path, set_path = solara.use_state(cast(Optional[Path], None))
     file_content, set_file_content = solara.use_state(cast(Optional[str], None))
     EXECUTION_BASE_PATH = Path(exec_base_path).resolve()
+    execution_base_path_str = str(EXECUTION_BASE_PATH)
     directory = solara.use_reactive(EXECUTION_BASE_PATH)
     message = solara.use_reactive(None)
     MAX_FILE_CT = 10000
-    exclude_prefixes = exclude_prefixes or []
+    # str.startswith takes a tuple and checks every prefix in one call
+    exclude_prefixes = tuple(exclude_prefixes or ())
 
     with solara.Column():
         def filter_path(p: Path) -> bool:
-            if any([str(p).startswith(prefix) for prefix in exclude_prefixes]):
-                return False
-            return True
+            return not exclude_prefixes or not str(p).startswith(exclude_prefixes)
 
         def protect():
             def check_base_path(value):
-                if not str(value).startswith(str(EXECUTION_BASE_PATH)):
+                if not str(value).startswith(execution_base_path_str):
                     directory.value = EXECUTION_BASE_PATH
                     message.value = f"Cannot leave root base path {EXECUTION_BASE_PATH}!"
                 else:
                     message.value = None
 
+            # returns the unsubscribe so the effect cleans up after itself
             return directory.subscribe(check_base_path)
 
-        solara.use_effect(protect)
+        # subscribe once per base path instead of on every render
+        solara.use_effect(protect, [execution_base_path_str])
         if message.value:
             error = message.value
         elif path is None:
@@ -43,43 +102,47 @@ def LogBrowser(exec_base_path, exclude_prefixes: List[str] = None):
             error = None
 
         def count_dir():
-            count = 0
-            for root, dirs, files in os.walk(str(path), topdown=False):
-                for _ in files:
-                    count += 1
-                    if count > MAX_FILE_CT:
-                        return count
-            return count
+            return count_files(str(path), os.stat(path).st_mtime_ns, MAX_FILE_CT)
 
         def download_dir():
             if path is not None and path.is_dir():
-                import io
-                import zipfile
-                zip_buffer = io.BytesIO()
-                zf = zipfile.ZipFile(zip_buffer, mode='w')
-
-                def remove_prefix(text, prefix):
-                    if text.startswith(prefix):
-                        return text[len(prefix):]
-                    return text
-
-                for root, dirs, files in os.walk(str(path), topdown=False):
-                    for name in files:
-                        # zf.writestr()
-                        this_file = str(os.path.join(root, name))
-                        in_zip_name = remove_prefix(this_file, str(path) + "/")
-                        with open(this_file, "rb") as f:
-                            zf.writestr(in_zip_name, f.read())
+                # large archives spill to disk while being built instead of growing in memory
+                zip_buffer = tempfile.SpooledTemporaryFile(max_size=64 << 20)
+                # compress and let zipfile stream each file from disk instead of reading it into memory,
+                # the fastest level already shrinks log text several times
+                zf = zipfile.ZipFile(zip_buffer, mode='w', compression=zipfile.ZIP_DEFLATED, compresslevel=1,
+                                     allowZip64=True)
+
+                for this_file, in_zip_name in walk_files(str(path)):
+                    try:
+                        zf.write(this_file, arcname=in_zip_name)
+                    except FileNotFoundError:
+                        # deleted since the walk
+                        continue
                 zf.close()
                 return zip_buffer
 
+        def download_dir_tar_zst():
+            if path is not None and path.is_dir():
+                tar_buffer = tempfile.SpooledTemporaryFile(max_size=64 << 20)
+                cctx = zstandard.ZstdCompressor(level=3, threads=-1)
+                with cctx.stream_writer(tar_buffer, closefd=False) as compressed, \
+                        tarfile.open(fileobj=compressed, mode='w|') as tar:
+                    for this_file, in_tar_name in walk_files(str(path)):
+                        try:
+                            tar.add(this_file, arcname=in_tar_name)
+                        except FileNotFoundError:
+                            # deleted since the walk
+                            continue
+                tar_buffer.seek(0)
+                return tar_buffer
+
         def last_10000_lines(p):
-            with open(p, "r") as f:
-                lines = f.readlines()
-                return "".join(lines[-10000:])
+            stat = os.stat(p)
+            return last_lines(str(p), stat.st_mtime_ns, stat.st_size, 10000)
 
         def on_path_select(p: Path) -> None:
-            if str(p).startswith(str(EXECUTION_BASE_PATH)):
+            if str(p).startswith(execution_base_path_str):
                 set_path(p)
                 try:
                     set_file_content(last_10000_lines(p))
@@ -100,7 +163,7 @@ def LogBrowser(exec_base_path, exclude_prefixes: List[str] = None):
             solara.Info(f"You selected file for download: {path}")
             # must be lambda otherwise will always try to download
             with solara.HBox():
-                solara.FileDownload(lambda: zip_bytes(path.open("rb").read(), path.name), path.name + ".zip",
+                solara.FileDownload(lambda: zip_file(path, path.name), path.name + ".zip",
                                     label=f"Download {path.name}.zip")
                 solara.Button(f"Clear Logs {path.name}", on_click=lambda: empty_file(str(path)),
                               style="margin-left: 25px")
@@ -115,6 +178,10 @@ def LogBrowser(exec_base_path, exclude_prefixes: List[str] = None):
                 zip_name = path.name + ".zip"
                 solara.FileDownload(lambda: download_dir(), zip_name, label=f"Download {file_ct} files in "
                                                                             f"{zip_name}")
+                if zstandard is not None:
+                    tar_zst_name = path.name + ".tar.zst"
+                    solara.FileDownload(lambda: download_dir_tar_zst(), tar_zst_name,
+                                        label=f"Download {file_ct} files in {tar_zst_name}")
 
         with solara.lab.Tabs():
             with solara.lab.Tab("Log File Browser"):
@@ -131,6 +198,6 @@ def LogBrowser(exec_base_path, exclude_prefixes: List[str] = None):
                         with solara.Card(f"Last 10k Logs: {path}"):
                             solara.Button(f"Refresh", on_click=lambda: set_file_content(last_10000_lines(path)),
                                           style="margin-left: 25px; margin-bottom: 25px")
-                            solara.Markdown("```" + (file_content or "\n") + "```", style="max-width: 100%; "
-                                                                                          "max-height: 500px; "
-                                                                                          "overflow: scroll;")
+                            # a plain escaped <pre> skips markdown parsing of up to 10k log lines on every refresh
+                            solara.HTML(tag="pre", unsafe_innerHTML=html.escape(file_content or ""),
+                                        style="max-width: 100%; max-height: 500px; overflow: scroll;")
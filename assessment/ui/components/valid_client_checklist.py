@@ -1,8 +1,9 @@
+from concurrent.futures import ThreadPoolExecutor
 from typing import cast, Tuple, List
 
 import solara
 
-from assessment.ui.models import WorkspaceConf
+from assessment.ui.models import workspace_conf_from_ini
 from assessment.ui.state import workspace_conf_ini
 
 
@@ -16,11 +17,17 @@ def ValidClientCheckList(selected_ws: solara.Reactive[List[str]],
 
     def validate_ws():
         try:
-            wc = WorkspaceConf.from_ini(workspace_conf_ini.value)
+            wc = workspace_conf_from_ini(workspace_conf_ini.value)
+            configs = list(wc.configs.items())
             valid_aliases: List[Tuple[str, str]] = []
-            for alias, config in wc.configs.items():
-                if config.ensure_cluster():
-                    valid_aliases.append((alias, config.host))  # makes api call and checks if cluster exists
+            if configs:
+                # each check is an api call to a different workspace so run them side by side,
+                # ensure_cluster swallows its own errors so one bad workspace does not fail the others
+                with ThreadPoolExecutor(max_workers=min(32, len(configs))) as executor:
+                    checks = executor.map(lambda item: item[1].ensure_cluster(), configs)
+                    for (alias, config), valid in zip(configs, checks):
+                        if valid:
+                            valid_aliases.append((alias, config.host))
             set_aliases(valid_aliases)
         except Exception as e:
             set_error(str(e))
@@ -1,8 +1,11 @@
 import configparser
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, Dict
 
+import pandas as pd
 from databricks.sdk import WorkspaceClient
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 from assessment.code_scanner.multi_ws import WorkspaceContextManager
 from assessment.code_scanner.utils import log
@@ -14,8 +17,15 @@ class DatabricksConfig(BaseModel):
     cluster_id: Optional[str] = None
     client_id: Optional[str] = None
     client_secret: Optional[str] = None
+    _ws_client: Optional[WorkspaceClient] = PrivateAttr(default=None)
 
     def get_ws_client(self) -> WorkspaceClient:
+        # building a client resolves auth so reuse it for the lifetime of the config
+        if self._ws_client is None:
+            self._ws_client = self._make_ws_client()
+        return self._ws_client
+
+    def _make_ws_client(self) -> WorkspaceClient:
         if self.token is not None:
             return WorkspaceClient(host=self.host,
                                    token=self.token)
@@ -60,10 +70,10 @@ class DatabricksConfig(BaseModel):
         self.get_ws_client().current_user.me()
 
 
-def hide_secret(d: dict, key: str) -> dict:
-    if key in d and d[key] is not None:
-        d[key] = d[key][:5] + "********"
-    return d
+def hide_secret(value: Optional[str]) -> Optional[str]:
+    if value is not None:
+        return value[:5] + "********"
+    return value
 
 
 class WorkspaceConf(BaseModel):
@@ -71,7 +81,8 @@ class WorkspaceConf(BaseModel):
 
     @classmethod
     def from_ini(cls, ini_str: str) -> "WorkspaceConf":
-        config = configparser.ConfigParser()
+        # values are used verbatim so skip the interpolation pass, which also lets tokens and secrets contain "%"
+        config = configparser.ConfigParser(interpolation=None)
         config.read_string(ini_str)
         databricks_configs = {}
         for section_name, config_data in config.items():
@@ -90,31 +101,42 @@ class WorkspaceConf(BaseModel):
     def _validate_cluster(client: WorkspaceClient, cluster_id: str):
         client.clusters.get(cluster_id)
 
+    @staticmethod
+    def _validate_config(section_name: str, config_data: DatabricksConfig) -> dict:
+        valid = True
+        auth_error = None
+        cluster_error = None
+        try:
+            config_data.check_access()
+            log.info("Access to %s is valid", section_name)
+        except Exception as e:
+            valid = False
+            auth_error = str(e)
+        try:
+            config_data.check_cluster()
+            log.info("Cluster for alias %s is valid", section_name)
+        except Exception as e:
+            valid = False
+            cluster_error = str(e)
+        # plain attribute reads of the fixed fields instead of a full pydantic serialization, secrets are masked
+        # as they are read
+        return {"host": config_data.host, "token": hide_secret(config_data.token),
+                "cluster_id": config_data.cluster_id, "client_id": config_data.client_id,
+                "client_secret": hide_secret(config_data.client_secret), "alias": section_name, "valid": valid,
+                "auth_error": auth_error, "cluster_error": cluster_error}
+
     def to_validate_df(self):
-        import pandas as pd
-        res = []
-        for section_name, config_data in self.configs.items():
-            d = config_data.model_dump()
-            d["alias"] = section_name
-            hide_secret(d, "token")
-            hide_secret(d, "client_secret")
-            valid = True
-            auth_error = None
-            cluster_error = None
-            try:
-                config_data.check_access()
-                log.info("Access to %s is valid", section_name)
-            except Exception as e:
-                valid = False
-                auth_error = str(e)
-            try:
-                config_data.check_cluster()
-                log.info("Cluster for alias %s is valid", section_name)
-            except Exception as e:
-                valid = False
-                cluster_error = str(e)
-            d["valid"] = valid
-            d["auth_error"] = auth_error
-            d["cluster_error"] = cluster_error
-            res.append(d)
+        items = list(self.configs.items())
+        if not items:
+            return pd.DataFrame()
+        # every workspace is validated with its own api calls so check them side by side, map keeps the order
+        with ThreadPoolExecutor(max_workers=min(32, len(items))) as executor:
+            res = list(executor.map(lambda item: self._validate_config(*item), items))
         return pd.DataFrame.from_records(res)
+
+
+@functools.lru_cache(maxsize=8)
+def workspace_conf_from_ini(ini_str: str) -> WorkspaceConf:
+    # keyed on the ini text so every caller shares one parse, and with it one client per workspace,
+    # until the settings change
+    return WorkspaceConf.from_ini(ini_str)
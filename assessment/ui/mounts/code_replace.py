@@ -1,9 +1,11 @@
+import hashlib
 import tempfile
 import traceback
-from typing import Callable, cast, Optional
+from typing import Callable, cast, Optional, Tuple
 
 import pandas as pd
 import solara
+import solara.lab
 from solara.components.file_drop import FileInfo
 
 from assessment.code_scanner.replace import FileIssueSimpleResolver, FileInputReader, FileOutputWriter
@@ -15,18 +17,19 @@ from assessment.code_scanner.utils import get_ws_client, log
 def get_issues_detail_message(issues: pd.DataFrame) -> str:
     if issues.shape[0] == 0:
         return "No issues found."
-    matching_mount_use_count = issues[issues['issue_type'] == 'MATCHING_MOUNT_USE'].shape[0]
-    matching_mount_use_simple_count = issues[
-        (issues['issue_type'] == 'MATCHING_MOUNT_USE') & (issues['issue_detail'] == 'SIMPLE')
-        ].shape[0]
-    matching_mount_use_maybe_count = issues[
-        (issues['issue_type'] == 'MATCHING_MOUNT_USE') & (issues['issue_detail'] == 'MAYBE')
-        ].shape[0]
-    matching_mount_use_cannot_convert_count = issues[
-        ~((issues['issue_type'] == 'MATCHING_MOUNT_USE') & (
-            (issues['issue_detail'] == 'SIMPLE')
-        ))
-    ].shape[0]
+    # build the masks once and derive every count from them, comparing the series keeps the fast path for
+    # categorical columns which compare on their codes
+    matching = (issues['issue_type'] == 'MATCHING_MOUNT_USE').to_numpy()
+    matching_mount_use_count = int(matching.sum())
+    if matching_mount_use_count == 0:
+        # nothing can be converted so skip comparing the details
+        matching_mount_use_simple_count = 0
+        matching_mount_use_maybe_count = 0
+    else:
+        issue_detail = issues['issue_detail']
+        matching_mount_use_simple_count = int((matching & (issue_detail == 'SIMPLE').to_numpy()).sum())
+        matching_mount_use_maybe_count = int((matching & (issue_detail == 'MAYBE').to_numpy()).sum())
+    matching_mount_use_cannot_convert_count = issues.shape[0] - matching_mount_use_simple_count
 
     return (f"Found {matching_mount_use_count} matching mount use issues. "
             f"{matching_mount_use_simple_count} simple, {matching_mount_use_maybe_count} maybe, "
@@ -39,18 +42,21 @@ def CodeFindAndReplace(issues: pd.DataFrame = None, set_issues: Callable[[pd.Dat
                        user: str = None, set_user: Callable[[str], None] = None,
                        token: str = None, set_token: Callable[[str], None] = None
                        ):
-    uploaded_file_contents, set_uploaded_file_contents = solara.use_state(cast(Optional[bytes], None))
+    # (content hash, parsed issues) of the last uploaded file
+    uploaded_issues, set_uploaded_issues = solara.use_state(cast(Tuple[Optional[bytes], Optional[pd.DataFrame]],
+                                                                 (None, None)))
     branch, set_branch = solara.use_state("uc_convert_")
 
-    loading, set_loading = solara.use_state(False)
     error, set_error = solara.use_state("")
+    # typing in the form inputs re-renders the component, only recount when the issues change
+    issues_detail_message = solara.use_memo(lambda: get_issues_detail_message(issues) if issues is not None else "",
+                                            [id(issues)])
 
     def find_and_replace():
         ws_client = get_ws_client(default_profile="uc-assessment-azure")
         curr_user = ws_client.current_user.me()
         user_name = curr_user.display_name
         email = curr_user.user_name
-        set_loading(True)
         set_error("")
         try:
             with tempfile.TemporaryDirectory() as path:
@@ -63,15 +69,24 @@ def CodeFindAndReplace(issues: pd.DataFrame = None, set_issues: Callable[[pd.Dat
         except Exception as e:
             set_error(str(e))
             log.error(traceback.format_exc())
-        finally:
-            set_loading(False)
+
+    # clone, rewrite and push run in a background thread so the click returns and the progress bar renders,
+    # no dependencies means it only runs when the button calls it
+    find_and_replace_task = solara.lab.use_task(find_and_replace, dependencies=None, raise_error=False)
 
     with solara.Card("Find And Replace"):
 
         def on_file(file_contents: FileInfo):
-            issues_pdf = pd.DataFrame(Issue.from_csv_bytes(file_contents.get("data")))
+            data = file_contents.get("data")
+            # dropping the same file again does not need to parse it again
+            content_hash = hashlib.blake2b(data, digest_size=16).digest()
+            cached_hash, cached_issues = uploaded_issues
+            if content_hash == cached_hash:
+                set_issues(cached_issues)
+                return
+            issues_pdf = Issue.dataframe_from_csv_bytes(data)
+            set_uploaded_issues((content_hash, issues_pdf))
             set_issues(issues_pdf)
-            set_uploaded_file_contents(file_contents.get("data"))
 
         solara.FileDrop(
             label="Drag and drop a issues csv file here.",
@@ -79,12 +94,12 @@ def CodeFindAndReplace(issues: pd.DataFrame = None, set_issues: Callable[[pd.Dat
             lazy=False,  # We will only read the first 100 bytes
         )
         solara.Button("Reload Issues",
-                      on_click=lambda: set_issues(pd.DataFrame(Issue.from_csv_bytes(uploaded_file_contents))),
+                      on_click=lambda: set_issues(uploaded_issues[1]),
                       style="margin-bottom: 8px")
         if issues is None:
             solara.Error("No issues found!")
         else:
-            solara.Info(f"Note: Using {issues.shape[0]} issues. {get_issues_detail_message(issues)}")
+            solara.Info(f"Note: Using {issues.shape[0]} issues. {issues_detail_message}")
             solara.Info("Note: Will only convert matching mount and simple issues so "
                         "download the issues and make modifications in excel.")
 
@@ -96,11 +111,13 @@ def CodeFindAndReplace(issues: pd.DataFrame = None, set_issues: Callable[[pd.Dat
         solara.InputText("User Name", value=user, on_value=set_user, continuous_update=True)
         solara.InputText("Token", value=token, on_value=set_token, password=True, continuous_update=True)
         solara.Button("Find and Replace", style="margin-bottom: 25px",
-                      on_click=find_and_replace,
-                      disabled=issues is None or loading is True)
+                      on_click=find_and_replace_task,
+                      disabled=issues is None or find_and_replace_task.pending)
 
-        if loading is True:
+        if find_and_replace_task.pending:
             solara.Info("Attempting to find and replace...")
             solara.ProgressLinear(True)
         elif error is not None and error != "":
             solara.Error("Error: " + error)
+        elif find_and_replace_task.error:
+            solara.Error(f"Error: {find_and_replace_task.exception}")
@@ -1,3 +1,4 @@
+import io
 from typing import Callable
 
 import pandas as pd
@@ -5,7 +6,7 @@ import solara
 
 from assessment.code_scanner.mounts import mounts_pdf
 from assessment.code_scanner.utils import zip_bytes
-from assessment.ui.state import workspace_url
+from assessment.ui.state import get_workspace_url
 
 # DESIGNED FOR SINGLE WORKSPACE
 @solara.component
@@ -13,8 +14,13 @@ def MountScanner(mounts: pd.DataFrame, set_mounts: Callable[[pd.DataFrame], None
     loading, set_loading = solara.use_state(False)
 
     def get_raw_data(csv=False, zip_file=True, file_name="mounts.zip"):
-        df_copy = mounts.copy(deep=True)
-        df_copy['workspace_url'] = workspace_url
+        # only add the column when it is missing, assign shares the existing columns instead of copying them
+        df_copy = mounts if 'workspace_url' in mounts.columns else mounts.assign(workspace_url=get_workspace_url())
+        if csv is True and zip_file is True:
+            # pandas writes the csv straight into the zip entry instead of building the whole string first
+            buffer = io.BytesIO()
+            df_copy.to_csv(buffer, index=False, compression={"method": "zip", "archive_name": file_name})
+            return buffer.getvalue()
         if csv is True:
             data = df_copy.to_csv(index=False)
         else:
@@ -1,6 +1,6 @@
 # DESIGNED FOR MULTIPLE WORKSPACES
+import io
 import json
-from collections import defaultdict
 from typing import List, cast, Optional, Callable
 
 import pandas as pd
@@ -10,7 +10,7 @@ import solara.lab
 from assessment.code_scanner.mounts import remote_mounts_pdf
 from assessment.code_scanner.utils import zip_bytes
 from assessment.ui.components.valid_client_checklist import ValidClientCheckList
-from assessment.ui.models import WorkspaceConf
+from assessment.ui.models import workspace_conf_from_ini
 from assessment.ui.state import workspace_conf_ini
 
 
@@ -57,7 +57,13 @@ def MountScannerV2(mounts: pd.DataFrame, set_mounts: Callable[[pd.DataFrame], No
     error, set_error = solara.use_state("")
 
     def get_raw_data(csv=False, zip_file=True, file_name="mounts.zip"):
-        df_copy = mounts.copy(deep=True)
+        # serializing does not modify the frame so there is nothing to copy
+        df_copy = mounts
+        if csv is True and zip_file is True:
+            # pandas writes the csv straight into the zip entry instead of building the whole string first
+            buffer = io.BytesIO()
+            df_copy.to_csv(buffer, index=False, compression={"method": "zip", "archive_name": file_name})
+            return buffer.getvalue()
         if csv is True:
             data = df_copy.to_csv(index=False)
         else:
@@ -69,23 +75,19 @@ def MountScannerV2(mounts: pd.DataFrame, set_mounts: Callable[[pd.DataFrame], No
         return data
 
     def process_mounts(mounts_pdf: pd.DataFrame) -> str:
-        org_host_mapping = {}
-        uc_mount_mapping = defaultdict(dict)
-        for record in mounts_pdf.to_dict(orient="records"):
-            is_valid = record.get("is_mount_valid")
-            if is_valid is True:
-                ws_url = record.get("workspace_url")
-                org_id = record.get("org_id")
-                mnt_path = record.get("raw_src")
-                mnt_target = record.get("target")
-                org_host_mapping[org_id] = ws_url
-                uc_mount_mapping[org_id][mnt_path] = mnt_target
+        # filter the valid mounts in one vectorized pass, reindex fills missing columns with nulls like record.get did
+        columns = mounts_pdf.reindex(columns=["is_mount_valid", "workspace_url", "org_id", "raw_src", "target"])
+        valid = columns[columns["is_mount_valid"].to_numpy() == True]
+        # dict(zip(...)) keeps the last value per key just like assigning row by row
+        org_host_mapping = dict(zip(valid["org_id"], valid["workspace_url"]))
+        uc_mount_mapping = {org_id: dict(zip(group["raw_src"], group["target"]))
+                            for org_id, group in valid.groupby("org_id", sort=False, dropna=False)}
         return get_raw_code(org_host_mapping, uc_mount_mapping)
 
     def get_mounts():
         set_loading(True)
         set_error("")
-        wc = WorkspaceConf.from_ini(workspace_conf_ini.value)
+        wc = workspace_conf_from_ini(workspace_conf_ini.value)
         pdfs = []
         for alias in selected_ws.value:
             set_current_ws(alias)
@@ -102,6 +104,9 @@ def MountScannerV2(mounts: pd.DataFrame, set_mounts: Callable[[pd.DataFrame], No
         set_mounts(pd.concat(pdfs, ignore_index=True))
         set_loading(False)
 
+    # the snippet only depends on the mounts so unrelated state changes do not rebuild it
+    mounts_snippet = solara.use_memo(lambda: process_mounts(mounts) if mounts is not None else "", [id(mounts)])
+
     with solara.Card("Download Mounts Info"):
         solara.Info("Note: This will ignore mounts: DatabricksRoot, DbfsReserved, UnityCatalogVolumes, "
                     "databricks/mlflow-tracking, databricks-datasets, databricks/mlflow-registry, databricks-results.")
@@ -122,4 +127,4 @@ def MountScannerV2(mounts: pd.DataFrame, set_mounts: Callable[[pd.DataFrame], No
                 with solara.lab.Tab("Raw Data..."):
                     solara.DataFrame(mounts)
                 with solara.lab.Tab("Shared Notebook Snippet"):
-                    solara.Markdown(f"```python{process_mounts(mounts)}```")
+                    solara.Markdown(f"```python{mounts_snippet}```")
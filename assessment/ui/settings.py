@@ -1,3 +1,4 @@
+import re
 from typing import cast, Optional
 
 import pandas as pd
@@ -11,29 +12,28 @@ from assessment.ui.models import WorkspaceConf
 from assessment.ui.state import workspace_conf_ini, repo_conf_toml
 
 
+# any line starting with token (after indentation) is replaced as a whole, [^\S\n] keeps the match on one line
+TOKEN_LINE_RE = re.compile(r"^[^\S\n]*token.*$", re.MULTILINE)
+
+
+def redact_content(content: str) -> str:
+    return TOKEN_LINE_RE.sub("token = dapi**********", content)
+
+
 @solara.component
 def WorkspaceConfig():
     workspace_conf, set_workspace_conf = solara.use_state(cast(Optional[WorkspaceConf], None))
     workspace_conf_df, set_workspace_conf_df = solara.use_state(cast(Optional[pd.DataFrame], None))
     error, set_error = solara.use_state("")
 
-    def redact_content(content: str) -> str:
-        lines = content.split("\n")
-        new_lines = []
-        for line in lines:
-            if line.strip().startswith("token"):
-                new_lines.append("token = dapi**********")
-            else:
-                new_lines.append(line)
-        return "\n".join(new_lines)
-
     solara.FileDrop(
         label="Upload Workspace Config",
         on_file=lambda file: workspace_conf_ini.set(file.get("data").decode("utf-8")),
         lazy=False
     )
+    redacted_conf_ini = solara.use_memo(lambda: redact_content(workspace_conf_ini.value), [workspace_conf_ini.value])
     v.Textarea(
-        v_model=redact_content(workspace_conf_ini.value),
+        v_model=redacted_conf_ini,
         solo=True, hide_details=True, outlined=True, rows=1,
         disabled=True,
         auto_grow=True)
@@ -1,9 +1,46 @@
 # Databricks notebook source
-# MAGIC %pip install git+https://github.com/stikkireddy/uc-assessment-tools.git@main dbtunnel
+# MAGIC %pip install --prefer-binary git+https://github.com/stikkireddy/uc-assessment-tools.git@main dbtunnel
 
 # COMMAND ----------
 
-dbutils.library.restartPython()
+import importlib.metadata
+import os
+import re
+import sys
+
+
+def normalize(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def needs_restart():
+    # restart unless nothing the %pip install above could have installed or upgraded is already imported,
+    # e.g. the runtime preloads an older databricks-sdk that only a restart replaces
+    if os.environ.get("FORCE_RESTART"):
+        return True
+    try:
+        installed = set()
+        pending = ["databricks-uc-assessments", "dbtunnel"]
+        while pending:
+            dist = normalize(pending.pop())
+            if dist in installed:
+                continue
+            installed.add(dist)
+            try:
+                requirements = importlib.metadata.requires(dist) or []
+            except importlib.metadata.PackageNotFoundError:
+                continue
+            pending.extend(re.match(r"[A-Za-z0-9._-]+", req).group(0) for req in requirements)
+        module_dists = importlib.metadata.packages_distributions()
+        imported = {normalize(dist) for module in list(sys.modules)
+                    for dist in module_dists.get(module.split(".")[0], [])}
+        return bool(installed & imported)
+    except Exception:
+        return True
+
+
+if needs_restart():
+    dbutils.library.restartPython()
 
 # COMMAND ----------
 
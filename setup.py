@@ -1,15 +1,29 @@
-from setuptools import setup, find_packages
+from pathlib import Path
 
-reqs = open("requirements.txt").read().split("\n")
+from setuptools import setup
+
+reqs = [line.strip() for line in Path(__file__).with_name("requirements.txt").read_text().splitlines()
+        if line.strip() and not line.strip().startswith("#")]
 
 setup(
     name='databricks-uc-assessments',
     author='Dipankar Kushari, Gary Diana, Sri Tikkireddy',
     author_email='dipankar.kushari@databricks.com, gary.diana@databricks.com, sri.tikkireddy@databricks.com',
     description='A package for a ui to do misc stuff in databricks',
-    packages=find_packages(exclude=['notebooks']),
+    packages=[
+        'assessment',
+        'assessment.code_scanner',
+        'assessment.jobs',
+        'assessment.jobs.upload',
+        'assessment.ui',
+        'assessment.ui.assessments',
+        'assessment.ui.components',
+        'assessment.ui.mounts',
+    ],
     setup_requires=['setuptools_scm'],
     install_requires=reqs,
+    extras_require={"re2": ["pyre2"]},
+    python_requires='>=3.8',
     license_files=('LICENSE',),
     classifiers=[
         'Intended Audience :: Developers',
@@ -17,6 +31,7 @@ setup(
         'Programming Language :: Python :: 3.8',
         'Programming Language :: Python :: 3.9',
         'Programming Language :: Python :: 3.10',
+        'Programming Language :: Python :: 3.11',
     ],
     keywords='Databricks Clusters',
 )